@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 # from flask_seasurf import SeaSurf
 from flask_talisman import Talisman
 from flask_cors import CORS
+from flask_socketio import SocketIO
 import os
 
 app = Flask(__name__)
@@ -58,11 +59,51 @@ app.secret_key = os.getenv("SECRET_KEY")
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=365*2)
 
 # Use SQLite
+# Every connection gets the WAL/synchronous/cache/mmap pragmas and a busy timeout (see backend/utils/database.py);
+# each process keeps a pool of connections for its request threads
+import backend.utils.database
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///info.db"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "8")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "8")),
+    "pool_timeout": 10,
+    "connect_args": {"timeout": 5},
+}
 db = SQLAlchemy(app) 
 
+# Solo games are kept server-side; the session cookie only holds the user id and the game version
+# Set GAME_STORE_URI to memory://, sqlite:///<file> (relative to the instance folder) or redis://...
+from backend.utils.game_store import create_game_store
+app.config["GAME_STORE_URI"] = os.getenv("GAME_STORE_URI", "sqlite:///game_store.db")
+game_store = create_game_store(app.config["GAME_STORE_URI"], app.instance_path)
+
+# Win/loss/abandon counts are buffered and written in batches, only when games end
+from backend.utils.stats import StatsBuffer
+app.config["STATS_FLUSH_INTERVAL"] = float(os.getenv("STATS_FLUSH_INTERVAL", "5"))
+app.config["STATS_FLUSH_SIZE"] = int(os.getenv("STATS_FLUSH_SIZE", "100"))
+stats = StatsBuffer(app, db, app.config["STATS_FLUSH_INTERVAL"], app.config["STATS_FLUSH_SIZE"])
+
+# Move hints and autoplay from a trained model (see backend/routes/inference.py), loaded once if
+# INFERENCE_MODEL names a saved DQN/QR-DQN/PPO zip, e.g. training/models/dqn_sixseven6.zip
+policy_service = None
+if os.getenv("INFERENCE_MODEL"):
+    from backend.utils.policy_service import PolicyService, load_policy
+    policy_service = PolicyService(load_policy(os.getenv("INFERENCE_MODEL")))
+
+# Persistent move channel for solo games (see backend/routes/solo_socket.py)
+socketio = SocketIO(app, cors_allowed_origins=["http://localhost:3000"])
+
 import backend.routes.solo
+import backend.routes.solo_socket
+import backend.routes.inference
+
+# Expired users are deleted by the cleanup-users CLI command (e.g. from cron) and, if CLEANUP_INTERVAL
+# is set to a number of seconds, by a background thread in each server process
+from backend.utils.maintenance import CleanupWorker
+app.config["CLEANUP_INTERVAL"] = float(os.getenv("CLEANUP_INTERVAL", "0"))
+if app.config["CLEANUP_INTERVAL"] > 0:
+    CleanupWorker(app.config["CLEANUP_INTERVAL"]).start()
 
 if __name__ == '__main__':
-    app.run(host="localhost", port=5000)
+    socketio.run(app, host="localhost", port=5000)
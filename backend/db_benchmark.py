@@ -0,0 +1,70 @@
+import argparse
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+# Concurrent /api/move traffic against the configured databases: several server processes
+# (like gunicorn workers) each serving several threads of players through Flask's test client.
+# Every move writes the game store and every finished game writes user stats, so throughput
+# and "database is locked" failures show how well the SQLite files cope with contention.
+# Run from the repository root: python -m backend.db_benchmark
+
+def play(app, seconds: float, results: list) -> None:
+    client = app.test_client()
+    moves = errors = 0
+    deadline = time.perf_counter() + seconds
+    client.post("/api/restart")
+    while time.perf_counter() < deadline:
+        try:
+            response = client.post("/api/move", data=random.choice(["up", "down", "left", "right"]))
+            if response.status_code == 200:
+                moves += 1
+                if response.get_json()["state"] != "In Progress":
+                    client.post("/api/restart")
+            elif response.status_code == 500:
+                errors += 1
+            else:
+                client.post("/api/restart")
+        except Exception:
+            errors += 1
+    results.append((moves, errors))
+
+def worker(num_threads: int, seconds: float, queue: multiprocessing.Queue) -> None:
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    from backend.app import app
+    app.logger.disabled = True
+    results = []
+    threads = [threading.Thread(target=play, args=(app, seconds, results)) for _ in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put((sum(moves for moves, errors in results), sum(errors for moves, errors in results)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent /api/move benchmark")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="Players per process")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    from backend.app import app, db
+    with app.app_context():
+        db.create_all()
+
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(args.threads, args.seconds, queue))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    totals = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    moves = sum(moves for moves, errors in totals)
+    errors = sum(errors for moves, errors in totals)
+    print(f"{args.processes} processes x {args.threads} players: {moves / args.seconds:.0f} moves/second, "
+          f"{errors} failed requests")
@@ -0,0 +1,50 @@
+import argparse
+import os
+import threading
+import time
+import urllib.request
+
+# Throughput of anonymous (cookie-less) GETs, the traffic bots, health checks and first visits produce.
+# Without --url the requests go through Flask's test client in this process, so the numbers measure
+# server-side work only. Run from the repository root: python -m backend.load_test
+
+def run_in_process(paths: list[str], num_requests: int) -> float:
+    os.environ.setdefault("SECRET_KEY", "load-test")
+    from backend.app import app, db
+    with app.app_context():
+        db.create_all()
+
+    start = time.perf_counter()
+    for i in range(num_requests):
+        # a new client per request: no cookie, like a first-time visitor
+        app.test_client().get(paths[i % len(paths)])
+    return num_requests / (time.perf_counter() - start)
+
+def run_http(url: str, paths: list[str], num_requests: int, num_threads: int) -> float:
+    def worker(count: int) -> None:
+        for i in range(count):
+            with urllib.request.urlopen(url.rstrip("/") + paths[i % len(paths)]) as response:
+                response.read()
+
+    threads = [threading.Thread(target=worker, args=(num_requests // num_threads,)) for _ in range(num_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return num_requests // num_threads * num_threads / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of anonymous GETs")
+    parser.add_argument("--url", help="Base URL of a running server; in-process test client if omitted")
+    parser.add_argument("--paths", default="/api/solo,/api/", help="Comma-separated GET paths to cycle through")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent clients with --url")
+    args = parser.parse_args()
+
+    paths = args.paths.split(",")
+    if args.url:
+        throughput = run_http(args.url, paths, args.requests, args.threads)
+    else:
+        throughput = run_in_process(paths, args.requests)
+    print(f"{args.requests} anonymous GETs of {', '.join(paths)}: {throughput:.0f} requests/second")
@@ -0,0 +1,52 @@
+from flask import session, request, abort, jsonify
+from backend.app import app, policy_service, stats
+from backend.routes.solo import MAX_BATCH_MOVES, load_solo_game, save_solo_game
+from backend.utils.util import dict_to_game
+
+# Hints and autoplay for solo games from the model loaded at startup (INFERENCE_MODEL)
+def require_policy_service():
+    if policy_service is None:
+        abort(503, description="No inference model is loaded")
+
+def load_game_in_progress():
+    game_dict = load_solo_game()
+    if game_dict is None:
+        abort(400, description="No game in progress")
+    game = dict_to_game(game_dict)
+    if game.get_state() != "In Progress":
+        abort(400, description="Game has already ended")
+    return game
+
+@app.route("/api/hint", methods=["GET"])
+def hint():
+    require_policy_service()
+    game = load_game_in_progress()
+    return jsonify({"move": policy_service.predict(game.get_game()._grid, game._valid_moves)})
+
+@app.route("/api/autoplay", methods=["POST"])
+def autoplay():
+    # POST /api/autoplay?steps=n lets the model make up to n moves (1 by default), stopping when the game ends
+    require_policy_service()
+    steps = request.args.get("steps", 1, type=int)
+    if not 1 <= steps <= MAX_BATCH_MOVES:
+        abort(400, description=f"steps must be between 1 and {MAX_BATCH_MOVES}")
+
+    game = load_game_in_progress()
+    moves = []
+    while len(moves) < steps and game.get_state() == "In Progress":
+        move = policy_service.predict(game.get_game()._grid, game._valid_moves)
+        game.move(move)
+        moves.append(move)
+
+    game_dict = save_solo_game(game.to_dict())
+    if game.get_state() == "Won":
+        stats.record(session["user_id"], num_wins=1)
+    elif game.get_state() == "Lost":
+        stats.record(session["user_id"], num_losses=1)
+
+    return jsonify({"game": {**game_dict, "version": session["game_version"]}, "moves": moves})
+
+@app.route("/api/inference/metrics", methods=["GET"])
+def inference_metrics():
+    require_policy_service()
+    return jsonify(policy_service.metrics())
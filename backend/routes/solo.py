@@ -1,53 +1,122 @@
-from flask import session, render_template, request, abort, jsonify
-from random import random
-from backend.app import db, app
+from flask import session, render_template, request, abort, jsonify, g
+from backend.app import db, app, game_store, stats
 from backend.models.user import User
-from backend.utils.util import generate_user_id, cleanup_expired_sessions, dict_to_game
+from backend.utils.game_store import VersionConflict
+from backend.utils.util import generate_user_id, dict_to_game
 from backend.utils.game_manager import GameManager
+from game import SPACE
 
-# session is permanent unless it expires, the user deletes cookie manually, or the server restarts 
-@app.before_request
-def ensure_session():
+# Shown to visitors without a game: reads never create users or games, the client starts one with /api/restart
+NOT_STARTED_GAME = {
+    "grid": [[SPACE] * 7 for _ in range(6)],
+    "rows": 6,
+    "columns": 7,
+    "round": 0,
+    "state": "Not Started",
+    "valid_moves": []
+}
+
+# Requests that never need a session
+SESSIONLESS_ENDPOINTS = {"static", "health"}
+
+def load_solo_game_version():
+    """(version, game dict) of the player's current game, or None if they have not started one (or it expired)."""
     if "user_id" not in session:
+        return None
+    stored = game_store.load(session["user_id"], session.get("game_version"))
+    if stored is not None:
+        g.solo_game_version = stored[0]
+    return stored
+
+def load_solo_game() -> dict:
+    stored = load_solo_game_version()
+    return None if stored is None else stored[1]
+
+def save_solo_game(game_dict: dict, replace: bool = False) -> dict:
+    """
+    Saves game_dict over the game this request loaded. If that game was changed meanwhile (e.g. over
+    the socket channel), aborts with 409 and the client has to reload it. replace saves unconditionally.
+    """
+    expected_version = None if replace else g.get("solo_game_version")
+    try:
+        session["game_version"] = game_store.save(session["user_id"], game_dict, expected_version)
+    except VersionConflict:
+        abort(409, description="The game was changed by another connection, reload it")
+    return game_dict
+
+# Users are created on their first state-changing request, not on their first visit
+def ensure_user() -> str:
+    if "user_id" not in session:
+        # session is permanent unless it expires, the user deletes cookie manually, or the server restarts 
         session["user_id"] = generate_user_id()
-        session["current_solo_game"] = GameManager(6, 7).to_dict()
         session.permanent = True 
         db.session.add(User(user_id=session["user_id"]))
         db.session.commit()
-    
-    if random() < 0.001:
-        cleanup_expired_sessions()
+    return session["user_id"]
+
+@app.before_request
+def ensure_session():
+    if request.endpoint in SESSIONLESS_ENDPOINTS:
+        return
+
+    if "current_solo_game" in session:
+        # cookies issued before games moved server-side
+        save_solo_game(session.pop("current_solo_game"), replace=True)
+
+@app.route("/api/health", methods=["GET"])
+def health():
+    return jsonify({"status": "ok"})
 
 @app.route("/api/", methods=["GET"])
 def index():
-    user_id = session["user_id"]
+    user_id = session.get("user_id")
+    if user_id is None:
+        return jsonify({"user_id": None, "wins": 0, "losses": 0, "abandoned": 0})
     user = User.query.get_or_404(user_id)
+    pending = stats.pending(user_id)
     user_profile = {
         "user_id": user_id,
-        "wins": user.num_wins,
-        "losses": user.num_losses,
-        "abandoned": user.num_abandoned_games
+        "wins": user.num_wins + pending["num_wins"],
+        "losses": user.num_losses + pending["num_losses"],
+        "abandoned": user.num_abandoned_games + pending["num_abandoned_games"]
     }
     return jsonify(user_profile)
 
 # Solo mode
+# Full state, including the static config that delta responses leave out. Supports conditional
+# GETs: the ETag names the game version, so an up-to-date client gets a 304 with no body.
 @app.route("/api/solo", methods=["GET"])
 def get_solo():
-    return jsonify(session["current_solo_game"])
+    stored = load_solo_game_version()
+    if stored is None:
+        return jsonify(NOT_STARTED_GAME)
+
+    version, game_dict = stored
+    etag = f"{session['user_id']}-{version}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({**game_dict, "version": version})
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
 
 @app.route("/api/restart", methods=["POST"])
 def restart():
-    game = dict_to_game(session["current_solo_game"])
-    if game.get_state() == "In Progress":
-        user_id = session["user_id"]
-        user = User.query.get_or_404(user_id)
-        user.num_abandoned_games += 1
-        db.session.commit()
+    user_id = ensure_user()
+    game_dict = load_solo_game()
+    abandoned = game_dict is not None and game_dict["state"] == "In Progress"
 
-    game.restart(6, 7)
-    session["current_solo_game"] = game.to_dict()
-    return jsonify(session["current_solo_game"])
+    game_dict = save_solo_game(GameManager(6, 7).to_dict(), replace=True)
+    # Counted once the new game is saved, so a retried restart does not count the abandon twice
+    if abandoned:
+        stats.record(user_id, num_abandoned_games=1)
+    return jsonify({**game_dict, "version": session["game_version"]})
 
+# POST /api/move?format=delta answers with only the changed cells, spawned tiles, round, state,
+# valid moves and the new version (see GameManager.move_delta) instead of the full game
 @app.route("/api/move", methods=["POST"])
 def make_move():
     # Expects "up", "down", "left", or "right" in the request body
@@ -57,19 +126,73 @@ def make_move():
     if not direction or direction not in ["up", "down", "left", "right"]:
         abort(400, description="Invalid move direction")
 
-    game = dict_to_game(session["current_solo_game"])
+    game_dict = load_solo_game()
+    if game_dict is None:
+        abort(400, description="No game in progress")
+    game = dict_to_game(game_dict)
     if game.get_state() != "In Progress":
         abort(400, description="Game has already ended")
 
-    game.move(direction)
-    session["current_solo_game"] = game.to_dict()
+    compact = request.args.get("format") == "delta"
+    if compact:
+        delta = game.move_delta(direction)
+    else:
+        game.move(direction)
+    game_dict = save_solo_game(game.to_dict())
 
-    user_id = session["user_id"]
-    user = User.query.get_or_404(user_id)
+    # Stats only change when the game ends
     if game.get_state() == "Won":
-        user.num_wins += 1
-    if game.get_state() == "Lost":
-        user.num_losses += 1
-    db.session.commit()
+        stats.record(session["user_id"], num_wins=1)
+    elif game.get_state() == "Lost":
+        stats.record(session["user_id"], num_losses=1)
     
-    return jsonify(session["current_solo_game"])
+    if compact:
+        return jsonify({**delta, "version": session["game_version"]})
+    return jsonify({**game_dict, "version": session["game_version"]})
+
+# Most directions one /api/moves request may carry
+MAX_BATCH_MOVES = 1000
+
+@app.route("/api/moves", methods=["POST"])
+def make_moves():
+    """
+    Applies a JSON list of directions ({"moves": [...]} or a bare list) in order to the player's
+    game with one load and one save, stopping at the first invalid move or when the game ends.
+    Returns the final game and the outcome of every attempted move.
+    """
+    body = request.get_json(silent=True)
+    directions = body.get("moves") if isinstance(body, dict) else body
+    if not isinstance(directions, list) or not all(isinstance(direction, str) for direction in directions):
+        abort(400, description="Expected a list of move directions")
+    if len(directions) > MAX_BATCH_MOVES:
+        abort(400, description=f"At most {MAX_BATCH_MOVES} moves per request")
+
+    game_dict = load_solo_game()
+    if game_dict is None:
+        abort(400, description="No game in progress")
+    game = dict_to_game(game_dict)
+    if game.get_state() != "In Progress":
+        abort(400, description="Game has already ended")
+
+    steps = []
+    for direction in directions:
+        direction = direction.strip().lower()
+        if direction not in game._valid_moves:
+            steps.append({"direction": direction, "result": "invalid"})
+            break
+        game.move(direction)
+        steps.append({"direction": direction, "result": "moved", "round": game._round_num, "state": game.get_state()})
+        if game.get_state() != "In Progress":
+            break
+
+    game_dict = save_solo_game(game.to_dict())
+    if game.get_state() == "Won":
+        stats.record(session["user_id"], num_wins=1)
+    elif game.get_state() == "Lost":
+        stats.record(session["user_id"], num_losses=1)
+
+    return jsonify({
+        "game": {**game_dict, "version": session["game_version"]},
+        "steps": steps,
+        "applied": sum(step["result"] == "moved" for step in steps)
+    })
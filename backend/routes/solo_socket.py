@@ -0,0 +1,97 @@
+from flask import request, session
+from flask_socketio import emit, disconnect
+from backend.app import socketio, game_store, stats
+from backend.utils.game_manager import GameManager
+from backend.utils.game_store import VersionConflict
+
+# Solo mode over a persistent socket (namespace /solo).
+# The player's GameManager stays in memory for the whole connection, so a move costs one slide,
+# one spawn and one legality check, and only the cells that changed are sent back.
+# The game is written to the game store when it ends, on restart, every SAVE_EVERY moves and on
+# disconnect, so the HTTP endpoints pick up where the socket left off. Socket saves cannot update
+# the session cookie, so both channels save with the version they loaded (compare-and-set): if the
+# game moved on over HTTP meanwhile, the socket's unsaved moves are dropped and the client gets
+# the stored game as a new "state", and an HTTP move on a copy older than a socket save gets a 409.
+SAVE_EVERY = 20
+NAMESPACE = "/solo"
+
+live_games = {}     # socket id -> [user_id, GameManager, moves since last save, stored version]
+
+def save_live_game(entry: list) -> bool:
+    """Saves the live game over the version it came from. False if it was stale and got replaced by the stored game."""
+    user_id, game, version = entry[0], entry[1], entry[3]
+    entry[2] = 0
+    try:
+        entry[3] = game_store.save(user_id, game.to_dict(), version)
+        return True
+    except VersionConflict:
+        pass
+
+    stored = game_store.load(user_id)
+    if stored is None:      # expired meanwhile
+        entry[3] = game_store.save(user_id, game.to_dict())
+        return True
+    entry[3], game_dict = stored
+    entry[1] = GameManager.from_dict(game_dict)
+    return False
+
+@socketio.on("connect", namespace=NAMESPACE)
+def solo_connect():
+    # The player must have a game already (started with /api/restart)
+    user_id = session.get("user_id")
+    stored = game_store.load(user_id, session.get("game_version")) if user_id else None
+    if stored is None:
+        return False
+
+    version, game_dict = stored
+    live_games[request.sid] = [user_id, GameManager.from_dict(game_dict), 0, version]
+    emit("state", {**game_dict, "version": version})
+
+@socketio.on("disconnect", namespace=NAMESPACE)
+def solo_disconnect(*args):
+    entry = live_games.pop(request.sid, None)
+    if entry is not None and entry[2] > 0:
+        save_live_game(entry)
+
+@socketio.on("move", namespace=NAMESPACE)
+def solo_move(direction):
+    entry = live_games.get(request.sid)
+    if entry is None:
+        disconnect()
+        return
+
+    direction = str(direction).strip().lower()
+    user_id, game = entry[0], entry[1]
+    if game.get_state() != "In Progress":
+        emit("error", {"description": "Game has already ended"})
+        return
+    if direction not in ["up", "down", "left", "right"]:
+        emit("error", {"description": "Invalid move direction"})
+        return
+
+    delta = game.move_delta(direction)
+    entry[2] += 1
+    if (game.get_state() != "In Progress" or entry[2] >= SAVE_EVERY) and not save_live_game(entry):
+        emit("state", {**entry[1].to_dict(), "version": entry[3]})
+        return
+    # Only counted once the ended game is saved: a stale game's ending is dropped with it
+    if game.get_state() == "Won":
+        stats.record(user_id, num_wins=1)
+    elif game.get_state() == "Lost":
+        stats.record(user_id, num_losses=1)
+    emit("delta", delta)
+
+@socketio.on("restart", namespace=NAMESPACE)
+def solo_restart():
+    entry = live_games.get(request.sid)
+    if entry is None:
+        disconnect()
+        return
+
+    abandoned = entry[1].get_state() == "In Progress"
+    entry[1] = GameManager(6, 7)
+    entry[2] = 0
+    entry[3] = game_store.save(entry[0], entry[1].to_dict())
+    if abandoned:
+        stats.record(entry[0], num_abandoned_games=1)
+    emit("state", {**entry[1].to_dict(), "version": entry[3]})
@@ -0,0 +1,33 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Applied to every SQLite connection the backend opens (SQLAlchemy's and the game store's).
+# WAL lets readers run alongside the single writer, and synchronous=NORMAL only syncs at
+# checkpoints: a power loss can drop the last few commits, but the database stays consistent.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,       # milliseconds to wait for a lock before "database is locked"
+    "cache_size": -20000,       # negative is KiB: 20 MB of page cache per connection
+    "mmap_size": 268435456,     # read pages through a 256 MB memory map
+    "temp_store": "MEMORY",
+}
+
+def apply_sqlite_pragmas(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+@event.listens_for(Engine, "connect")
+def _on_connect(dbapi_connection, connection_record) -> None:
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        apply_sqlite_pragmas(dbapi_connection)
+
+def create_missing_indexes(db) -> None:
+    """create_all only indexes new tables, so add indexes declared since an existing table was created."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
@@ -6,7 +6,7 @@ training_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 if training_path not in sys.path:
     sys.path.append(training_path)
 
-from game import Game
+from game import SPACE, Game
 
 class GameManager():
 
@@ -16,13 +16,36 @@ class GameManager():
         self._state = "In Progress"
         self._round_num = 1
         self._valid_moves = self._game.get_valid_moves()
+        self._spawned = []
     
+    @classmethod
+    def from_dict(cls, game_dict: dict) -> "GameManager":
+        """
+        Restores a manager saved with to_dict without spawning tiles or recomputing valid moves
+        when the dict has them cached.
+        """
+        manager = cls.__new__(cls)
+        # copy: saved dicts may be shared with the game store's cache, and Game mutates its grid in place
+        manager._game = Game.from_grid([row[:] for row in game_dict["grid"]])
+        manager._game._generated_operations = game_dict.get("included_operations", manager._game._generated_operations)
+        manager._game._prob_operations = game_dict.get("operator_spawn_rate", manager._game._prob_operations)
+        manager._game._generated_digits = game_dict.get("included_digits", manager._game._generated_digits)
+        manager._game._num_generated_tiles = game_dict.get("generated_tiles_per_turn", manager._game._num_generated_tiles)
+        manager._round_num = game_dict["round"]
+        manager._state = game_dict["state"]
+        manager._valid_moves = game_dict.get("valid_moves")
+        if manager._valid_moves is None:
+            manager.update_valid_moves()
+        manager._spawned = []
+        return manager
+
     def restart(self, num_rows: int, num_cols: int) -> None:
         self._game = Game(num_rows, num_cols)
         self._game.generate_tiles()
         self._state = "In Progress"
         self._round_num = 1
         self._valid_moves = self._game.get_valid_moves()
+        self._spawned = []
 
     def get_game(self):
         return self._game
@@ -49,10 +72,12 @@ class GameManager():
             "included_digits": self._game._generated_digits,
             "generated_tiles_per_turn": self._game._num_generated_tiles,
             "round": self._round_num,
-            "state": self._state
+            "state": self._state,
+            "valid_moves": self._valid_moves
         }
 
     def move(self, direction: str) -> None:
+        self._spawned = []
         # Make move
         if direction in self._valid_moves:
             match (direction):
@@ -70,7 +95,30 @@ class GameManager():
                 self._valid_moves = []
             else:
                 self._round_num += 1
+                blank_spaces = self._game._blank_spaces.copy()
                 self._game.generate_tiles()
+                self._spawned = [(i, j) for i, j in blank_spaces if self._game._grid[i][j] != SPACE]
                 self._valid_moves = self._game.get_valid_moves()
                 if self._valid_moves == []:
                     self._state = "Lost"
+
+    def move_delta(self, direction: str) -> dict:
+        """
+        Makes a move and returns only what it changed: [row, col, value] for cells changed by the
+        slide ("changed") and for the tiles spawned after it ("spawned"), plus round, state and valid moves.
+        """
+        old_grid = [row[:] for row in self._game._grid]
+        self.move(direction)
+
+        grid = self._game._grid
+        spawned = set(self._spawned)
+        changed = [[i, j, cell]
+                   for i, (old_row, row) in enumerate(zip(old_grid, grid)) if old_row != row
+                   for j, (old_cell, cell) in enumerate(zip(old_row, row)) if old_cell != cell and (i, j) not in spawned]
+        return {
+            "changed": changed,
+            "spawned": [[i, j, grid[i][j]] for i, j in self._spawned],
+            "round": self._round_num,
+            "state": self._state,
+            "valid_moves": self._valid_moves
+        }
@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from backend.utils.database import apply_sqlite_pragmas
+
+# Server-side storage for solo games, keyed by user_id.
+# The session cookie only carries the user_id and the version of the last saved state;
+# every save bumps the version, so a worker whose cached copy is older than the cookie
+# knows to reload it from the shared backend. A cookie can still lag behind the store (the
+# socket channel saves without updating it), so writers pass the version they loaded as
+# expected_version and a save over a newer game raises VersionConflict instead.
+
+class VersionConflict(Exception):
+    """The stored game is no longer at the version the caller loaded (or is gone)."""
+
+class MemoryGameStore:
+    """
+    In-process LRU of game states with TTL eviction.
+
+    With a backend, this is a write-through cache in front of it: saves go to both, and
+    loads only reach the backend on a miss or when the cached version is older than the
+    caller's. Without one, the games only live in this process.
+    Cached states are shared, not copied, so callers must not mutate what load returns.
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl: float = 3600, backend=None):
+        self._entries = OrderedDict()   # user_id -> (version, state, expires at)
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+
+    def _get(self, user_id: str):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry
+
+    def _put(self, user_id: str, version: int, state: dict) -> None:
+        with self._lock:
+            self._entries[user_id] = (version, state, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def load(self, user_id: str, version: int = None):
+        """Returns (version, state), or None if there is no stored game."""
+        entry = self._get(user_id)
+        if entry is not None and (version is None or entry[0] >= version):
+            return entry[0], entry[1]
+        if self.backend is None:
+            return None
+
+        stored = self.backend.load(user_id, version)
+        if stored is not None:
+            self._put(user_id, *stored)
+        return stored
+
+    def save(self, user_id: str, state: dict, expected_version: int = None) -> int:
+        """
+        Stores state as the user's current game and returns its new version. With expected_version,
+        only replaces that version of the game, else raises VersionConflict (and drops the cached copy,
+        so the next load reads the backend).
+        """
+        if self.backend is not None:
+            try:
+                version = self.backend.save(user_id, state, expected_version)
+            except VersionConflict:
+                with self._lock:
+                    self._entries.pop(user_id, None)
+                raise
+            self._put(user_id, version, state)
+            return version
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[2] < time.monotonic():
+                entry = None
+            current = None if entry is None else entry[0]
+            if expected_version is not None and current != expected_version:
+                raise VersionConflict(user_id)
+            version = 1 if current is None else current + 1
+            self._entries[user_id] = (version, state, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return version
+
+    def delete(self, *user_ids: str) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+        if self.backend is not None and user_ids:
+            self.backend.delete(*user_ids)
+
+class SQLiteGameStore:
+    """Game states as JSON rows in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()     # sqlite3 connections are per thread
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS game_states ("
+                "user_id TEXT PRIMARY KEY, version INTEGER NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5)
+            apply_sqlite_pragmas(conn)
+        return conn
+
+    def load(self, user_id: str, version: int = None):
+        row = self._connect().execute("SELECT version, state FROM game_states WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def save(self, user_id: str, state: dict, expected_version: int = None) -> int:
+        state = json.dumps(state, separators=(",", ":"))
+        with self._connect() as conn:
+            if expected_version is not None:
+                row = conn.execute(
+                    "UPDATE game_states SET version = version + 1, state = ?, updated_at = ? "
+                    "WHERE user_id = ? AND version = ? RETURNING version",
+                    (state, time.time(), user_id, expected_version),
+                ).fetchone()
+                if row is None:
+                    raise VersionConflict(user_id)
+                return row[0]
+            return conn.execute(
+                "INSERT INTO game_states (user_id, version, state, updated_at) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET version = version + 1, state = excluded.state, "
+                "updated_at = excluded.updated_at RETURNING version",
+                (user_id, state, time.time()),
+            ).fetchone()[0]
+
+    def delete(self, *user_ids: str) -> None:
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM game_states WHERE user_id = ?", [(user_id,) for user_id in user_ids])
+
+class RedisGameStore:
+    """
+    Game states in Redis (or anything speaking redis-py's get/set/incr/delete, such as a local
+    stand-in), expiring after ttl seconds without a save. Saves with expected_version also need
+    redis-py's pipeline and WATCH.
+    """
+
+    def __init__(self, client, ttl: int = 60 * 60 * 24 * 365 * 2, prefix: str = "solo_game:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def load(self, user_id: str, version: int = None):
+        value = self.client.get(self.prefix + user_id)
+        if value is None:
+            return None
+        stored = json.loads(value)
+        return stored["version"], stored["state"]
+
+    def save(self, user_id: str, state: dict, expected_version: int = None) -> int:
+        if expected_version is not None:
+            return self._save_if_version(user_id, state, expected_version)
+        version = self.client.incr(self.prefix + user_id + ":version")
+        self.client.expire(self.prefix + user_id + ":version", self.ttl)
+        self.client.set(self.prefix + user_id, json.dumps({"version": version, "state": state}, separators=(",", ":")),
+                        ex=self.ttl)
+        return version
+
+    def _save_if_version(self, user_id: str, state: dict, expected_version: int) -> int:
+        from redis.exceptions import WatchError
+        version_key = self.prefix + user_id + ":version"
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(version_key)
+                current = pipe.get(version_key)
+                if current is None or int(current) != expected_version:
+                    raise VersionConflict(user_id)
+                version = expected_version + 1
+                pipe.multi()
+                pipe.set(version_key, version, ex=self.ttl)
+                pipe.set(self.prefix + user_id, json.dumps({"version": version, "state": state}, separators=(",", ":")),
+                         ex=self.ttl)
+                pipe.execute()
+            except WatchError:
+                raise VersionConflict(user_id) from None
+        return version
+
+    def delete(self, *user_ids: str) -> None:
+        keys = [key for user_id in user_ids for key in (self.prefix + user_id, self.prefix + user_id + ":version")]
+        if keys:
+            self.client.delete(*keys)
+
+def create_game_store(uri: str, base_dir: str = ".", max_size: int = 10_000, ttl: float = 3600) -> MemoryGameStore:
+    """
+    Builds the store named by uri, always behind an in-process LRU:
+        memory://              games only live in this process
+        sqlite:///game.db      SQLite file (relative paths are resolved against base_dir)
+        redis://host:port/0    Redis, needs the redis package
+    """
+    if uri.startswith("memory://"):
+        return MemoryGameStore(max_size, ttl)
+    if uri.startswith("sqlite:///"):
+        path = os.path.join(base_dir, uri[len("sqlite:///"):])
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return MemoryGameStore(max_size, ttl, SQLiteGameStore(path))
+    if uri.startswith("redis://") or uri.startswith("rediss://"):
+        import redis
+        return MemoryGameStore(max_size, ttl, RedisGameStore(redis.Redis.from_url(uri)))
+    raise ValueError(f"Unsupported game store URI: {uri}")
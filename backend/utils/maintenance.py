@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import datetime
+
+import click
+
+from backend.app import app, db, game_store
+from backend.models.user import User
+from backend.utils.database import create_missing_indexes
+
+# Users (and their stored games) expire with their session cookie
+def cleanup_expired_users(batch_size: int = 1000, max_batches: int = None) -> dict:
+    """
+    Deletes users created more than PERMANENT_SESSION_LIFETIME ago, batch_size rows per transaction
+    so the user table is never locked for long. Compares the indexed created_at column against
+    a precomputed cutoff. Returns the number of rows deleted and the time taken.
+    """
+    start = time.perf_counter()
+    cutoff = datetime.utcnow() - app.config["PERMANENT_SESSION_LIFETIME"]
+    deleted = 0
+    batches = 0
+
+    with app.app_context():
+        while max_batches is None or batches < max_batches:
+            user_ids = db.session.scalars(
+                db.select(User.user_id).where(User.created_at < cutoff).limit(batch_size)
+            ).all()
+            if not user_ids:
+                break
+            db.session.execute(db.delete(User).where(User.user_id.in_(user_ids)))
+            db.session.commit()
+            game_store.delete(*user_ids)
+            deleted += len(user_ids)
+            batches += 1
+            if len(user_ids) < batch_size:
+                break
+
+    return {"deleted": deleted, "batches": batches, "seconds": time.perf_counter() - start}
+
+class CleanupWorker:
+    """Runs cleanup_expired_users every interval seconds on a daemon thread, off the request path."""
+
+    def __init__(self, interval: float, batch_size: int = 1000):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="user-cleanup", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                result = cleanup_expired_users(self.batch_size)
+                app.logger.info("Deleted %d expired users in %.3f seconds", result["deleted"], result["seconds"])
+            except Exception:
+                app.logger.exception("Expired user cleanup failed")
+
+# Run from cron with: flask --app backend.app cleanup-users
+@app.cli.command("cleanup-users")
+@click.option("--batch-size", default=1000, show_default=True, help="Users deleted per transaction")
+@click.option("--max-batches", type=int, default=None, help="Stop after this many batches")
+def cleanup_users_command(batch_size: int, max_batches: int) -> None:
+    """Delete users whose session has expired."""
+    result = cleanup_expired_users(batch_size, max_batches)
+    click.echo(f"Deleted {result['deleted']} expired users in {result['batches']} batches "
+               f"({result['seconds']:.3f} seconds)")
+
+@app.cli.command("init-db")
+def init_db_command() -> None:
+    """Create missing tables and indexes."""
+    db.create_all()
+    create_missing_indexes(db)
+    click.echo("Database is up to date")
@@ -0,0 +1,182 @@
+import json
+import queue
+import threading
+import time
+import zipfile
+from collections import OrderedDict, deque
+
+import numpy as np
+
+import backend.utils.game_manager   # puts training/ on sys.path
+from game import grid_hash
+from sixseven_env import NUM_CHANNELS
+from vec_env import MOVES, encode_boards
+
+class NumpyMLP:
+    """
+    Forward pass of an exported SB3 MLP in plain NumPy: layers are ("linear", W, b), ("relu",)
+    or ("tanh",) applied in order, and num_quantiles > 1 averages QR-DQN quantiles into Q-values.
+    """
+
+    def __init__(self, layers: list[tuple], num_quantiles: int = 1):
+        self.layers = layers
+        self.num_quantiles = num_quantiles
+
+    @property
+    def input_size(self) -> int:
+        return self.layers[0][1].shape[0]
+
+    def __call__(self, observations: np.ndarray) -> np.ndarray:
+        x = observations.astype(np.float32, copy=False)
+        for layer in self.layers:
+            if layer[0] == "linear":
+                x = x @ layer[1] + layer[2]
+            elif layer[0] == "relu":
+                x = np.maximum(x, 0, out=x)
+            else:
+                x = np.tanh(x, out=x)
+        if self.num_quantiles > 1:
+            x = x.reshape(len(x), self.num_quantiles, -1).mean(axis=1)
+        return x
+
+def _export_sequential(modules) -> list[tuple]:
+    import torch.nn as nn
+    layers = []
+    for module in modules:
+        if isinstance(module, nn.Linear):
+            layers.append(("linear", module.weight.detach().cpu().numpy().T.copy(),
+                           module.bias.detach().cpu().numpy().copy()))
+        elif isinstance(module, nn.ReLU):
+            layers.append(("relu",))
+        elif isinstance(module, nn.Tanh):
+            layers.append(("tanh",))
+        else:
+            raise ValueError(f"Cannot export {type(module).__name__} to NumPy")
+    return layers
+
+def load_policy(path: str) -> NumpyMLP:
+    """
+    Loads a saved DQN, QR-DQN or PPO/A2C model with a flat observation and an MLP policy once,
+    and exports it to a NumpyMLP scoring the four moves (Q-values or action logits).
+    """
+    with zipfile.ZipFile(path) as archive:
+        policy_module = json.loads(archive.read("data"))["policy_class"]["__module__"]
+
+    if policy_module.startswith("sb3_contrib.qrdqn"):
+        from sb3_contrib import QRDQN
+        quantile_net = QRDQN.load(path, device="cpu").policy.quantile_net
+        return NumpyMLP(_export_sequential(quantile_net.quantile_net), quantile_net.n_quantiles)
+    if policy_module.startswith("stable_baselines3.dqn"):
+        from stable_baselines3 import DQN
+        return NumpyMLP(_export_sequential(DQN.load(path, device="cpu").policy.q_net.q_net))
+
+    from stable_baselines3 import PPO
+    policy = PPO.load(path, device="cpu").policy
+    return NumpyMLP(_export_sequential(list(policy.mlp_extractor.policy_net) + [policy.action_net]))
+
+class _Request:
+    __slots__ = ("grid", "scores", "error", "done")
+
+    def __init__(self, grid: list[list[int]]):
+        self.grid = grid
+        self.scores = None
+        self.error = None
+        self.done = threading.Event()
+
+class PolicyService:
+    """
+    Serves move predictions from one policy to many request threads.
+
+    Requests are queued and a worker thread runs them through the policy in micro-batches of up
+    to max_batch boards, waiting at most max_wait seconds for a batch to fill. Move scores are
+    cached per board (Zobrist hash), and predict picks the best-scoring valid move.
+    """
+
+    def __init__(self, policy: NumpyMLP, num_rows: int = 6, num_cols: int = 7, max_batch: int = 64,
+                 max_wait: float = 0.002, cache_size: int = 100_000, latency_window: int = 10_000):
+        if policy.input_size != num_rows * num_cols * NUM_CHANNELS:
+            raise ValueError(f"Policy expects {policy.input_size} inputs, a {num_rows}x{num_cols} board encodes to "
+                             f"{num_rows * num_cols * NUM_CHANNELS}")
+        self.policy = policy
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=latency_window)
+        self.requests = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.batched_boards = 0
+        self._thread = threading.Thread(target=self._run, name="policy-inference", daemon=True)
+        self._thread.start()
+
+    def _scores(self, grid: list[list[int]]) -> np.ndarray:
+        key = grid_hash(grid)
+        with self._lock:
+            self.requests += 1
+            scores = self._cache.get(key)
+            if scores is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return scores
+
+        request = _Request(grid)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+
+        with self._lock:
+            self._cache[key] = request.scores
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return request.scores
+
+    def predict(self, grid: list[list[int]], valid_moves: list[str]) -> str:
+        """Best move for grid among valid_moves."""
+        start = time.perf_counter()
+        scores = self._scores(grid)
+        move = max(valid_moves, key=lambda move: scores[MOVES.index(move)])
+        self._latencies.append(time.perf_counter() - start)
+        return move
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                scores = self.policy(encode_boards(np.array([request.grid for request in batch])))
+            except Exception as error:
+                for request in batch:
+                    request.error = error
+                    request.done.set()
+                continue
+
+            self.batches += 1
+            self.batched_boards += len(batch)
+            for request, request_scores in zip(batch, scores):
+                request.scores = request_scores
+                request.done.set()
+
+    def metrics(self) -> dict:
+        latencies = np.array(self._latencies) * 1000
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cache_size": len(self._cache),
+            "batches": self.batches,
+            "mean_batch_size": self.batched_boards / self.batches if self.batches else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        }
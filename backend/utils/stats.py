@@ -0,0 +1,97 @@
+import atexit
+import threading
+from collections import defaultdict
+
+from sqlalchemy import bindparam, update
+
+# Columns of User that StatsBuffer increments
+STAT_COLUMNS = ("num_wins", "num_losses", "num_abandoned_games")
+
+class StatsBuffer:
+    """
+    Buffers per-user win/loss/abandon increments in memory and writes them to the User table
+    in one batched UPDATE ... SET num_wins = num_wins + ? statement.
+
+    Flushes from a background thread every interval seconds, or as soon as max_pending users have
+    increments waiting, and at interpreter exit. Requests never flush themselves, so a failing
+    database cannot fail them; increments of a failed flush are kept for the next one.
+    """
+
+    def __init__(self, app, db, interval: float = 5.0, max_pending: int = 100):
+        self.app = app
+        self.db = db
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = defaultdict(lambda: dict.fromkeys(STAT_COLUMNS, 0))
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        atexit.register(self.close)
+
+    def record(self, user_id: str, num_wins: int = 0, num_losses: int = 0, num_abandoned_games: int = 0) -> None:
+        with self._lock:
+            counts = self._pending[user_id]
+            counts["num_wins"] += num_wins
+            counts["num_losses"] += num_losses
+            counts["num_abandoned_games"] += num_abandoned_games
+            full = len(self._pending) >= self.max_pending
+            # Started lazily so each worker process gets its own flusher after forking
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stats-flush", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def pending(self, user_id: str) -> dict:
+        """Increments recorded for user_id that have not reached the database yet."""
+        with self._lock:
+            counts = self._pending.get(user_id)
+            return dict(counts) if counts is not None else dict.fromkeys(STAT_COLUMNS, 0)
+
+    def flush(self) -> int:
+        """Writes every buffered increment; returns the number of users updated."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(STAT_COLUMNS, 0))
+            if not batch:
+                return 0
+
+            from backend.models.user import User
+            table = User.__table__
+            statement = (
+                update(table)
+                .where(table.c.user_id == bindparam("uid"))
+                .values({column: table.c[column] + bindparam(f"add_{column}") for column in STAT_COLUMNS})
+            )
+            rows = [{"uid": user_id, **{f"add_{column}": count for column, count in counts.items()}}
+                    for user_id, counts in batch.items()]
+            try:
+                with self.app.app_context():
+                    self.db.session.execute(statement, rows)
+                    self.db.session.commit()
+            except Exception:
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    for user_id, counts in batch.items():
+                        for column, count in counts.items():
+                            self._pending[user_id][column] += count
+                raise
+            return len(rows)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Failed to flush user stats")
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self.flush()
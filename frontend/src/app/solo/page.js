@@ -40,7 +40,14 @@ export default function Solo() {
         credentials: "include"
         })
         .then((res) => res.json())
-        .then((data) => setGame(data))
+        .then((data) => {
+            // First visit: the game is only created once the player asks for one
+            if (data.state === "Not Started") {
+                restart();
+            } else {
+                setGame(data);
+            }
+        })
         .catch((err) => console.error(err));
     }
 
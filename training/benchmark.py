@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from game import SPACE, Game, auto_play, collapse_list_left, collapse_list_right, remove_extra_spaces
+from sixseven_env import SixSevenEnv
+
+# Benchmark suite for the game engine, the training env and the backend move endpoint.
+# Every benchmark is a (prepare, run) pair: prepare(n) builds the inputs for n operations outside
+# the timer, and run(inputs) performs them and returns how many operations it did. Each benchmark
+# is timed `repeat` times after a warm-up run; the fastest repeat is the score (slower repeats are
+# the machine being busy, not the code), and the median is kept alongside it.
+#
+#   python benchmark.py --json results.json             # run everything, write JSON results
+#   python benchmark.py --save-baseline                 # store results as the baseline
+#   python benchmark.py --only slide_ --tolerance 0.1   # compare a subset against the baseline
+#
+# Baselines are only comparable on the machine that recorded them.
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+MOVES = ["up", "down", "left", "right"]
+
+def sample_grids(num_grids: int, num_rows: int = 6, num_cols: int = 7, seed: int = 0) -> list[list[list[int]]]:
+    """Boards from random play, taken after each spawn, so they look like the ones the engine sees."""
+    rng = random.Random(seed)
+    grids = []
+    while len(grids) < num_grids:
+        game = Game(num_rows, num_cols, random.Random(rng.random()))
+        for _ in range(1000):
+            game.generate_tiles()
+            valid_moves = game.get_valid_moves()
+            if not valid_moves or len(grids) >= num_grids:
+                break
+            grids.append([row[:] for row in game._grid])
+            getattr(game, f"slide_{rng.choice(valid_moves)}")()
+            if game.is_won() or game.is_lost():
+                break
+    return grids
+
+GRIDS = sample_grids(2000)
+LINES = [remove_extra_spaces(row) for grid in GRIDS for row in grid]
+
+def _cycle(items: list, n: int) -> list:
+    return [items[k % len(items)] for k in range(n)]
+
+def collapse_benchmark(collapse: callable) -> tuple[callable, callable]:
+    def run(lines: list[list[int]]) -> int:
+        for line in lines:
+            collapse(line)
+        return len(lines)
+    return lambda n: _cycle(LINES, n), run
+
+def slide_benchmark(move: str) -> tuple[callable, callable]:
+    # Slides change the game, so every operation gets its own copy of a sampled board
+    def prepare(n: int) -> list[Game]:
+        return [Game.from_grid([row[:] for row in grid]) for grid in _cycle(GRIDS, n)]
+
+    def run(games: list[Game]) -> int:
+        for game in games:
+            getattr(game, f"slide_{move}")()
+        return len(games)
+    return prepare, run
+
+def valid_moves_benchmark() -> tuple[callable, callable]:
+    games = [Game.from_grid(grid) for grid in GRIDS]
+
+    def run(games: list[Game]) -> int:
+        for game in games:
+            game.get_valid_moves()
+        return len(games)
+    return lambda n: _cycle(games, n), run
+
+def generate_tiles_benchmark() -> tuple[callable, callable]:
+    grids = [grid for grid in GRIDS if sum(row.count(SPACE) for row in grid) >= 2]
+
+    def prepare(n: int) -> list[Game]:
+        random.seed(0)
+        return [Game.from_grid([row[:] for row in grid]) for grid in _cycle(grids, n)]
+
+    def run(games: list[Game]) -> int:
+        for game in games:
+            game.generate_tiles()
+        return len(games)
+    return prepare, run
+
+def env_step_benchmark() -> tuple[callable, callable]:
+    env = SixSevenEnv()
+
+    def prepare(n: int) -> list[int]:
+        env.reset(seed=0)
+        rng = random.Random(0)
+        return [rng.randrange(4) for _ in range(n)]
+
+    def run(actions: list[int]) -> int:
+        for action in actions:
+            observation, reward, terminated, truncated, info = env.step(action)
+            if terminated or truncated:
+                env.reset()
+        return len(actions)
+    return prepare, run
+
+def env_reset_benchmark() -> tuple[callable, callable]:
+    env = SixSevenEnv()
+    env.reset(seed=0)
+
+    def run(n: int) -> int:
+        for _ in range(n):
+            env.reset()
+        return n
+    return lambda n: n, run
+
+def env_observation_benchmark() -> tuple[callable, callable]:
+    env = SixSevenEnv()
+    env.reset(seed=0)
+    for action in range(20):
+        env.step(action % 4)
+
+    def run(n: int) -> int:
+        for _ in range(n):
+            env._get_observation()
+        return n
+    return lambda n: n, run
+
+def auto_play_benchmark(size: int) -> tuple[callable, callable]:
+    # Scored per move: game lengths grow quickly with the board
+    def prepare(n: int) -> int:
+        random.seed(size)
+        return n
+
+    def run(num_games: int) -> int:
+        return sum(auto_play(size, size, rng=random.Random(k))[1] for k in range(num_games))
+    return prepare, run
+
+def api_move_benchmark() -> tuple[callable, callable]:
+    """POST /api/move through Flask's test client: session, game store load/save and the move itself."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    from backend.app import app, db
+    app.logger.disabled = True
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.post("/api/restart")
+
+    def prepare(n: int) -> list[str]:
+        rng = random.Random(0)
+        return [rng.choice(MOVES) for _ in range(n)]
+
+    def run(moves: list[str]) -> int:
+        for move in moves:
+            response = client.post("/api/move", data=move)
+            if response.status_code != 200 or response.get_json()["state"] != "In Progress":
+                client.post("/api/restart")
+        return len(moves)
+    return prepare, run
+
+# name -> (benchmark factory, operations per repeat, unit)
+BENCHMARKS = {
+    "collapse_list_left": (lambda: collapse_benchmark(collapse_list_left), 50_000, "line"),
+    "collapse_list_right": (lambda: collapse_benchmark(collapse_list_right), 50_000, "line"),
+    **{f"slide_{move}": (lambda move=move: slide_benchmark(move), 20_000, "slide") for move in MOVES},
+    "get_valid_moves": (valid_moves_benchmark, 20_000, "call"),
+    "generate_tiles": (generate_tiles_benchmark, 20_000, "call"),
+    "env_step": (env_step_benchmark, 10_000, "step"),
+    "env_reset": (env_reset_benchmark, 5_000, "reset"),
+    "env_get_observation": (env_observation_benchmark, 20_000, "call"),
+    **{f"auto_play_{size}x{size}": (lambda size=size: auto_play_benchmark(size), num_games, "move")
+       for size, num_games in ((5, 100), (6, 50), (7, 20), (8, 10), (9, 4), (10, 2))},
+    "api_move": (api_move_benchmark, 2_000, "request"),
+}
+
+def run_benchmark(name: str, number: int, repeat: int) -> dict:
+    factory, default_number, unit = BENCHMARKS[name]
+    prepare, run = factory()
+    run(prepare(max(1, number // 10)))     # warm-up: imports, caches, first allocations
+
+    times = []
+    for _ in range(repeat):
+        inputs = prepare(number)
+        start = time.perf_counter()
+        ops = run(inputs)
+        times.append((time.perf_counter() - start) / ops)
+    return {
+        "unit": unit,
+        "ops": ops,
+        "repeat": repeat,
+        "best_us": min(times) * 1e6,
+        "median_us": statistics.median(times) * 1e6,
+    }
+
+def run_suite(names: list[str], scale: float = 1.0, repeat: int = 5) -> dict:
+    results = {}
+    for name in names:
+        number = max(1, int(BENCHMARKS[name][1] * scale))
+        results[name] = run_benchmark(name, number, repeat)
+        print(f"{name:<22} {results[name]['best_us']:>10.2f} us/{results[name]['unit']}", file=sys.stderr)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.node(),
+            "scale": scale,
+        },
+        "results": results,
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    Rows of (name, baseline, current, ratio, status) for benchmarks present in both runs.
+    A benchmark regresses when its best time exceeds the baseline's by more than tolerance.
+    """
+    rows = []
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["best_us"]
+        ratio = result["best_us"] / before
+        if ratio > 1 + tolerance:
+            status = "REGRESSION"
+        elif ratio < 1 - tolerance:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"name": name, "baseline_us": before, "current_us": result["best_us"], "ratio": ratio,
+                     "status": status})
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Game engine, env and backend benchmarks")
+    parser.add_argument("--only", action="append", default=[], help="Run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--skip-backend", action="store_true", help="Skip the /api/move benchmark")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply operations per repeat (e.g. 0.1 for a quick run)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file (- for stdout)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.only or any(part in name for part in args.only)]
+    if args.skip_backend:
+        names = [name for name in names if name != "api_move"]
+    results = run_suite(names, args.scale, args.repeat)
+
+    if args.json == "-":
+        print(json.dumps(results, indent=2))
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            rows = compare(results, json.load(f), args.tolerance)
+        for row in rows:
+            print(f"{row['name']:<22} {row['baseline_us']:>10.2f} -> {row['current_us']:>10.2f} us "
+                  f"({row['ratio']:.2f}x) {row['status']}", file=sys.stderr)
+        if any(row["status"] == "REGRESSION" for row in rows):
+            sys.exit(1)
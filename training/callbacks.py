@@ -0,0 +1,36 @@
+from stable_baselines3.common.callbacks import BaseCallback
+
+from profiling import PhaseTimer
+
+class ProfilingCallback(BaseCallback):
+    """
+    Profiles every SixSevenEnv in the training VecEnv (DummyVecEnv or SubprocVecEnv, Monitor-wrapped
+    or not) and, after each rollout, records the rollout's per-step phase timings to the SB3 logger:
+    profile/<phase>_us (microseconds per env step), profile/<phase>_calls (calls per env step) and
+    profile/env_steps_per_second, which show up in TensorBoard next to the rollout rewards.
+    """
+
+    def __init__(self, verbose: int = 0):
+        super().__init__(verbose)
+
+    def _on_training_start(self) -> None:
+        self.training_env.env_method("enable_profiling")
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_rollout_end(self) -> None:
+        timer = PhaseTimer()
+        for snapshot in self.training_env.env_method("profile_snapshot"):
+            timer.merge(snapshot)
+        self.training_env.env_method("reset_profile")
+
+        steps = timer.calls.get("step")
+        if not steps:
+            return
+        for phase in timer.calls:
+            self.logger.record(f"profile/{phase}_us", timer.seconds[phase] / steps * 1e6)
+            self.logger.record(f"profile/{phase}_calls", timer.calls[phase] / steps)
+        self.logger.record("profile/env_steps_per_second", steps / timer.seconds["step"])
+        if self.verbose >= 1:
+            print(timer.summary())
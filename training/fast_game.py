@@ -0,0 +1,343 @@
+import functools
+import random
+import time
+
+import numpy as np
+
+from game import (ADDITION, GLOBAL_SPAWNER, MULTIPLICATION, OPERATORS, SPACE, SUBTRACTION, Game, TileSpawner,
+                  canonical_grid_hash, grid_hash)
+
+# Batched NumPy kernels for stacks of boards: collapse_lines, slide_board, successor_boards and
+# valid_move_mask step many boards per call (SixSevenVecEnv in vec_env.py). They only pay off over
+# a stack; on one board NumPy call overhead makes them 10-15x slower than Game's list engine, so
+# single games (env, bots, backend) stay on Game. ReferenceArrayGame runs the kernels on one board
+# with Game's interface, as the reference that differential_check plays against Game.
+
+# int64 so products never wrap before out_of_bounds ends the game
+CELL_DTYPE = np.int64
+
+# Same order as Game.get_valid_moves and SixSevenEnv's action ids
+MOVES = ["up", "down", "left", "right"]
+
+# Lines up to this length compact through a lookup table with one row per keep-mask
+MAX_TABLE_LENGTH = 12
+
+@functools.cache
+def _compaction_table(length: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(mask weights, gather order per mask, kept count per mask) for lines of this length."""
+    weights = 1 << np.arange(length)
+    keep = (np.arange(1 << length)[:, None] & weights) > 0
+    return weights, np.argsort(~keep, axis=1, kind="stable"), keep.sum(axis=1)
+
+def _compact(lines: np.ndarray, keep: np.ndarray) -> np.ndarray:
+    """Stable-moves the kept cells of every line to the front and pads the rest with SPACE."""
+    length = lines.shape[-1]
+    if length > MAX_TABLE_LENGTH:
+        order = np.argsort(~keep, axis=-1, kind="stable")
+        compacted = np.take_along_axis(lines, order, axis=-1)
+        counts = keep.sum(axis=-1, keepdims=True)
+    else:
+        weights, orders, kept_counts = _compaction_table(length)
+        masks = (keep * weights).sum(axis=-1)
+        offsets = np.arange(0, masks.size * length, length).reshape(masks.shape)
+        compacted = np.ascontiguousarray(lines).reshape(-1)[orders[masks] + offsets[..., None]]
+        counts = kept_counts[masks][..., None]
+    return np.where(np.arange(length) < counts, compacted, SPACE)
+
+def _is_operator(lines: np.ndarray, operations: list[int]) -> np.ndarray:
+    # a few scalar comparisons are much cheaper than np.isin on lines this short
+    is_op = lines == operations[0]
+    for operator in operations[1:]:
+        is_op |= lines == operator
+    return is_op
+
+def collapse_lines(lines: np.ndarray, reverse=False, operations: list[int] = OPERATORS) -> np.ndarray:
+    """
+    Batched equivalent of remove_extra_spaces + collapse_list_left/collapse_list_right.
+
+    Args:
+        lines: Array of shape (..., L); every line along the last axis is collapsed independently
+        reverse: False collapses towards index 0 (left/up), True towards index L-1 (right/down).
+                 Either a bool or a boolean array broadcastable to lines.shape[:-1] + (1,)
+        operations: Operator codes, same meaning as in collapse_list_left
+
+    Returns:
+        A new array with the same shape as lines
+    """
+    reverse = np.asarray(reverse, dtype=bool)
+    if reverse.ndim:
+        lines = np.where(reverse, lines[..., ::-1], lines)
+    elif reverse:
+        lines = lines[..., ::-1]
+
+    length = lines.shape[-1]
+    lines = _compact(lines, lines != SPACE)
+
+    # collapse_operators: an operator equal to the cell before it is part of a run
+    is_op = _is_operator(lines, operations)
+    duplicate = np.zeros_like(is_op)
+    duplicate[..., 1:] = is_op[..., 1:] & (lines[..., 1:] == lines[..., :-1])
+    if duplicate.any():
+        lines = _compact(lines, ~duplicate)
+        is_op = _is_operator(lines, operations)
+
+    if length >= 3:
+        is_num = ~is_op & (lines != SPACE)
+        match = is_num[..., :-2] & is_op[..., 1:-1] & is_num[..., 2:]
+
+        if match.any():
+            # Greedy scan from the collapsing side: a match at i can only be blocked by a
+            # taken match at i - 2 (a match at i - 1 would need lines[i] to be an operator)
+            take = match.copy()
+            for i in range(2, length - 2):
+                take[..., i] &= ~take[..., i - 2]
+
+            first, operator, second = lines[..., :-2], lines[..., 1:-1], lines[..., 2:]
+            if reverse.any():
+                # lines are mirrored, but evaluation is always left to right
+                first, second = np.where(reverse, second, first), np.where(reverse, first, second)
+            value = np.select(
+                [operator == ADDITION, operator == SUBTRACTION, operator == MULTIPLICATION],
+                [first + second, first - second, first * second],
+                0,
+            )
+
+            lines = lines.copy()
+            lines[..., :-2] = np.where(take, value, lines[..., :-2])
+            removed = np.zeros(lines.shape, dtype=bool)
+            removed[..., 1:-1] |= take
+            removed[..., 2:] |= take
+            lines = _compact(lines, ~removed)
+
+    if reverse.ndim:
+        return np.where(reverse, lines[..., ::-1], lines)
+    elif reverse:
+        return lines[..., ::-1]
+    return lines
+
+def slide_board(board: np.ndarray, direction: str) -> np.ndarray:
+    """Returns the successor of a (..., rows, cols) board stack for one direction."""
+    if direction == "left":
+        return collapse_lines(board)
+    elif direction == "right":
+        return collapse_lines(board, reverse=True)
+
+    columns = np.swapaxes(board, -1, -2)
+    if direction == "up":
+        return np.swapaxes(collapse_lines(columns), -1, -2)
+    return np.swapaxes(collapse_lines(columns, reverse=True), -1, -2)
+
+def successor_boards(board: np.ndarray) -> dict[str, np.ndarray]:
+    """Successors of a (..., rows, cols) board stack in all four directions using two kernel calls."""
+    rows = collapse_lines(np.stack([board, board]), reverse=np.array([False, True]).reshape(2, *[1] * board.ndim))
+    columns = np.swapaxes(board, -1, -2)
+    cols = collapse_lines(np.stack([columns, columns]), reverse=np.array([False, True]).reshape(2, *[1] * board.ndim))
+    return {
+        "up": np.swapaxes(cols[0], -1, -2),
+        "down": np.swapaxes(cols[1], -1, -2),
+        "left": rows[0],
+        "right": rows[1],
+    }
+
+def line_moves_mask(lines: np.ndarray, operations: list[int] = OPERATORS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batched game.line_moves: for (..., L) lines returns (can collapse towards index 0,
+    can collapse towards index L-1), each of shape lines.shape[:-1], without collapsing anything.
+    """
+    is_tile = lines != SPACE
+    is_space = ~is_tile
+    gap_before_tile = (is_tile[..., 1:] & np.logical_or.accumulate(is_space, axis=-1)[..., :-1]).any(axis=-1)
+    gap_after_tile = (is_space[..., 1:] & np.logical_or.accumulate(is_tile, axis=-1)[..., :-1]).any(axis=-1)
+
+    # Operator runs and num op num triples are found on the lines with spaces removed
+    lines = _compact(lines, is_tile)
+    is_op = _is_operator(lines, operations)
+    can_merge = (is_op[..., 1:] & (lines[..., 1:] == lines[..., :-1])).any(axis=-1)
+    if lines.shape[-1] >= 3:
+        is_num = ~is_op & (lines != SPACE)
+        can_merge |= (is_num[..., :-2] & is_op[..., 1:-1] & is_num[..., 2:]).any(axis=-1)
+
+    return gap_before_tile | can_merge, gap_after_tile | can_merge
+
+def valid_move_mask(boards: np.ndarray) -> np.ndarray:
+    """(..., rows, cols) board stack -> (..., 4) bool mask of valid moves in MOVES order."""
+    can_left, can_right = line_moves_mask(boards)
+    can_up, can_down = line_moves_mask(np.swapaxes(boards, -1, -2))
+    return np.stack([can_up.any(axis=-1), can_down.any(axis=-1), can_left.any(axis=-1), can_right.any(axis=-1)], axis=-1)
+
+class ReferenceArrayGame:
+    """
+    Game's interface on one (rows, cols) array, driven by the batched kernels. It is a correctness
+    reference for the kernels (see differential_check), not a faster Game: use Game for single games.
+
+    The board holds the same cell codes as Game, and every slide is computed for all lines at once
+    by collapse_lines. Tile spawning uses the same spawners as Game.generate_tiles, so both engines
+    produce identical games from identical seeds.
+    """
+
+    def __init__(self, num_rows: int, num_cols: int, rng: random.Random = None):
+        """Pass rng to give this game its own spawn stream; without it spawns use the global random."""
+        self._board = np.full((num_rows, num_cols), SPACE, dtype=CELL_DTYPE)
+        self._num_rows = num_rows
+        self._num_cols = num_cols
+        self._generated_operations = OPERATORS.copy()
+        self._prob_operations = 0.67
+        self._generated_digits = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+        self._num_generated_tiles = 2 # set this to somewhere between 2 to 4
+        self._round_num = 1
+        self._spawner = GLOBAL_SPAWNER if rng is None else TileSpawner(rng)
+
+    # Nested-list views so callers written against Game (models, env, GameManager) keep working
+    @property
+    def _grid(self) -> list[list[int]]:
+        return self._board.tolist()
+
+    @_grid.setter
+    def _grid(self, grid) -> None:
+        self._board = np.array(grid, dtype=CELL_DTYPE)
+
+    @property
+    def _blank_spaces(self) -> list[tuple[int, int]]:
+        rows, cols = np.nonzero(self._board == SPACE)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    def num_blank(self) -> int:
+        return int(np.count_nonzero(self._board == SPACE))
+
+    def __str__(self):
+        board = ""
+        for row in self._board.tolist():
+            cur_row = ""
+            for cell in row:
+                cur_row += f"| {self.character_str(cell):^3} "
+            cur_row += "|\n"
+            board += cur_row
+        return board
+
+    def character_str(self, character: int) -> str:
+        return Game.character_str(self, character)
+
+    @classmethod
+    def from_grid(cls, grid: list[list[int]], rng: random.Random = None) -> "ReferenceArrayGame":
+        game = cls(len(grid), len(grid[0]), rng)
+        game.set_game(grid)
+        return game
+
+    def set_game(self, grid) -> None:
+        self._grid = grid
+
+    # Hashed from scratch: the board is rebuilt wholesale by every slide anyway
+    def board_hash(self) -> int:
+        return grid_hash(self._grid)
+
+    def canonical_hash(self) -> int:
+        return canonical_grid_hash(self._grid)
+
+    def generate_tiles(self) -> None:
+        # Same draws, in the same order, as Game.generate_tiles
+        blank_indices = np.flatnonzero(self._board == SPACE)
+        num_blank_spaces = len(blank_indices)
+        num_tiles_to_generate = min(num_blank_spaces, self._num_generated_tiles)
+        tiles = self._spawner.sample_tiles(num_blank_spaces, num_tiles_to_generate, self._generated_operations,
+                                           self._generated_digits, self._prob_operations)
+
+        flat_board = self._board.reshape(-1)
+        for cur_index, tile in tiles:
+            flat_board[blank_indices[cur_index]] = tile
+
+    def left(self) -> list[list[int]]:
+        return slide_board(self._board, "left").tolist()
+
+    def right(self) -> list[list[int]]:
+        return slide_board(self._board, "right").tolist()
+
+    def up(self) -> list[list[int]]:
+        return slide_board(self._board, "up").tolist()
+
+    def down(self) -> list[list[int]]:
+        return slide_board(self._board, "down").tolist()
+
+    def get_valid_moves(self) -> list[str]:
+        return [move for move, valid in zip(MOVES, valid_move_mask(self._board).tolist()) if valid]
+
+    def get_successors(self) -> dict[str, list[list[int]]]:
+        """Maps each valid move to the grid it produces, from the same kernel pass as get_valid_moves."""
+        successors = successor_boards(self._board)
+        return {move: board.tolist() for move, board in successors.items() if not np.array_equal(board, self._board)}
+
+    def __slide(self, direction: str) -> None:
+        self._board = np.ascontiguousarray(slide_board(self._board, direction))
+
+    def slide_up(self) -> None:
+        self.__slide("up")
+
+    def slide_down(self) -> None:
+        self.__slide("down")
+
+    def slide_left(self) -> None:
+        self.__slide("left")
+
+    def slide_right(self) -> None:
+        self.__slide("right")
+
+    def is_won(self) -> bool:
+        return bool((self._board == 67).any())
+
+    def is_lost(self, valid_moves: list[str] = None) -> bool:
+        """Check if game is lost. Optionally pass valid_moves to avoid recalculation."""
+        if valid_moves is None:
+            valid_moves = self.get_valid_moves()
+        if self.is_won():
+            return False
+        numbers = self._board[(self._board != SPACE) & ~_is_operator(self._board, OPERATORS)]
+        return len(valid_moves) == 0 or bool(((numbers < -1000) | (numbers > 1000)).any())
+
+def differential_check(num_games: int, num_rows: int = 6, num_cols: int = 7, seed: int = 0) -> None:
+    """
+    Plays the same games on Game and ReferenceArrayGame from identical seeds and raises
+    AssertionError on the first state that differs.
+    """
+    for game_index in range(num_games):
+        games = []
+        for game_class in (Game, ReferenceArrayGame):
+            random.seed(seed + game_index)
+            move_rng = random.Random(seed + game_index)
+            # odd games spawn from their own generator, even games from the global random
+            game = game_class(num_rows, num_cols, random.Random(seed + game_index) if game_index % 2 else None)
+            history = []
+
+            for _ in range(1000):
+                game.generate_tiles()
+                valid_moves = game.get_valid_moves()
+                # copy: Game mutates its grid in place on the next spawn
+                history.append(([row[:] for row in game._grid], valid_moves, game.up(), game.down(), game.left(), game.right(),
+                                game._blank_spaces, game.num_blank(), game.board_hash(), game.canonical_hash()))
+                if not valid_moves:
+                    break
+                successors = game.get_successors()
+                assert list(successors) == valid_moves
+                move = move_rng.choice(valid_moves)
+                getattr(game, f"slide_{move}")()
+                assert game._grid == successors[move]
+                history.append(([row[:] for row in game._grid], game.is_won(), game.is_lost(), game.board_hash(),
+                                game.canonical_hash()))
+                if game.is_won() or game.is_lost():
+                    break
+            games.append(history)
+
+        assert games[0] == games[1], f"engines diverge in game {game_index} (seed {seed + game_index})"
+
+if __name__ == "__main__":
+    differential_check(200)
+    differential_check(50, 10, 10, seed=1000)
+    print("Game and the batched kernels agree")
+
+    for game_class in (Game, ReferenceArrayGame):
+        random.seed(0)
+        game = game_class(6, 7)
+        game.generate_tiles()
+        start = time.time()
+        for i in range(2000):
+            game.get_valid_moves()
+            game.slide_left()
+        print(f"{game_class.__name__}: 2000 valid-move checks + slides took", time.time() - start, "seconds")
@@ -1,4 +1,9 @@
+import functools
 import random
+import threading
+from collections import OrderedDict
+
+from profiling import GAME_PHASES, PhaseTimer, instrument, uninstrument
 
 # Constants for operations - NEED TO CHANGE IF CHANGING THE MAXIMUM/MINIMUM VALUES
 ADDITION = 1001
@@ -80,6 +85,219 @@ def collapse_list_right(lst: list[int], operations: list[int] = OPERATORS) -> li
     result.reverse()
     return result
 
+def line_moves(lst: list[int], operations: list[int] = OPERATORS) -> tuple[bool, bool]:
+    """
+    Returns (can collapse left, can collapse right) for one row or column without building the collapsed line.
+    A line changes iff it has a gap before (left) / after (right) a tile, a run of equal operators,
+    or a num op num triple once spaces are ignored; the scan stops as soon as both answers are known.
+    """
+    can_left = can_right = False
+    seen_space = seen_tile = False
+    prev = prev_prev = SPACE    # last two tiles, ignoring spaces
+
+    for cell in lst:
+        if cell == SPACE:
+            seen_space = True
+            can_right = can_right or seen_tile
+        else:
+            can_left = can_left or seen_space
+            if cell in operations:
+                if cell == prev:
+                    return True, True
+            elif prev in operations and prev_prev != SPACE and prev_prev not in operations:
+                return True, True
+            prev_prev, prev = prev, cell
+            seen_tile = True
+
+        if can_left and can_right:
+            return True, True
+
+    return can_left, can_right
+
+def collapse_line(line: tuple[int, ...], to_end: bool) -> tuple[int, ...]:
+    """Collapsed line padded back to len(line); to_end is False for left/up and True for right/down."""
+    padding = (SPACE,) * len(line)
+    if to_end:
+        collapsed = collapse_list_right(remove_extra_spaces(line))
+        return padding[len(collapsed):] + tuple(collapsed)
+    collapsed = collapse_list_left(remove_extra_spaces(line))
+    return tuple(collapsed) + padding[len(collapsed):]
+
+class LineCache:
+    """
+    Bounded LRU of line transitions, keyed on (tuple of cell values, direction).
+
+    A line's collapse only depends on its cells, so left/right/up/down look every row or
+    column up here before running collapse (collapse_line, or a rule variant's routine).
+    Safe to share between threads (the backend's request handlers all use LINE_CACHE).
+    """
+
+    def __init__(self, max_size: int = 1 << 16, collapse: callable = collapse_line):
+        self._collapse = collapse
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, line: tuple[int, ...], to_end: bool) -> tuple[tuple[int, ...], tuple[int, ...]]:
+        """
+        Collapsed line padded back to len(line), and the offsets of its blank cells.
+        to_end is False for left/up and True for right/down.
+        """
+        key = (line, to_end)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Collapsing is pure, so it runs outside the lock; two threads missing on the same line
+        # just store the same entry twice
+        result = self._collapse(line, to_end)
+        entry = (result, tuple(k for k, cell in enumerate(result) if cell == SPACE))
+
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def collapse(self, line: tuple[int, ...], to_end: bool) -> tuple[int, ...]:
+        """Collapsed line padded back to len(line); to_end is False for left/up and True for right/down."""
+        return self.lookup(line, to_end)[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+# Shared by every Game in the process so self-play games warm it up for each other
+LINE_CACHE = LineCache()
+
+class GlobalRandomSpawner:
+    """Spawns tiles from the module-global random exactly as Game always has, so random.seed() controls them."""
+
+    def sample_tiles(self, num_blank_spaces: int, num_tiles: int, operations: list[int], digits: list[int],
+                     prob_operations: float) -> list[tuple[int, int]]:
+        """Returns (blank space index, tile) for num_tiles distinct blank spaces."""
+        tiles = []
+        for cur_index in random.sample(range(num_blank_spaces), num_tiles):
+            if random.random() <= prob_operations:
+                tiles.append((cur_index, random.choice(operations)))
+            else:
+                tiles.append((cur_index, random.choice(digits)))
+        return tiles
+
+class TileSpawner:
+    """
+    Spawns tiles from an injected random.Random, so a game's spawns are reproducible on their own.
+    Uniforms are pre-drawn in blocks and every tile uses three of them (position, kind, value)
+    instead of separate sample/random/choice calls.
+    """
+
+    def __init__(self, rng: random.Random, block_size: int = 768):
+        self._rng = rng
+        self._block_size = block_size
+        self._block = []
+        self._next = 0
+
+    def _take(self, count: int) -> list[float]:
+        if self._next + count > len(self._block):
+            rng_random = self._rng.random
+            self._block = self._block[self._next:] + [rng_random() for _ in range(max(self._block_size, count))]
+            self._next = 0
+        draws = self._block[self._next:self._next + count]
+        self._next += count
+        return draws
+
+    def sample_tiles(self, num_blank_spaces: int, num_tiles: int, operations: list[int], digits: list[int],
+                     prob_operations: float) -> list[tuple[int, int]]:
+        """Returns (blank space index, tile) for num_tiles distinct blank spaces."""
+        draws = self._take(3 * num_tiles)
+        tiles = []
+        chosen = []
+        for j in range(num_tiles):
+            # j-th pick among the blank spaces not chosen yet
+            cur_index = int(draws[3 * j] * (num_blank_spaces - j))
+            for prev_index in sorted(chosen):
+                if cur_index >= prev_index:
+                    cur_index += 1
+            chosen.append(cur_index)
+
+            if draws[3 * j + 1] <= prob_operations:
+                tiles.append((cur_index, operations[int(draws[3 * j + 2] * len(operations))]))
+            else:
+                tiles.append((cur_index, digits[int(draws[3 * j + 2] * len(digits))]))
+        return tiles
+
+GLOBAL_SPAWNER = GlobalRandomSpawner()
+
+# Zobrist keys: one fixed 64-bit key per (cell position, tile value), where position is i * num_cols + j.
+# Keys are derived from the pair itself rather than drawn in order, so hashes agree across processes.
+ZOBRIST_SEED = 0x6767676767676767
+_ZOBRIST_KEYS = {}
+
+def zobrist_key(pos: int, value: int) -> int:
+    key = _ZOBRIST_KEYS.get((pos, value))
+    if key is None:
+        # splitmix64 finalizer of (seed, pos, value)
+        x = (ZOBRIST_SEED ^ (pos << 32) ^ (value & 0xFFFFFFFF)) + 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF
+        x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & 0xFFFFFFFFFFFFFFFF
+        x = (x ^ (x >> 27)) * 0x94D049BB133111EB & 0xFFFFFFFFFFFFFFFF
+        key = _ZOBRIST_KEYS[(pos, value)] = x ^ (x >> 31)
+    return key
+
+@functools.lru_cache(maxsize=1 << 16)
+def line_hash(line: tuple[int, ...], first_pos: int, stride: int) -> int:
+    """XOR of the Zobrist keys of a line's tiles, the k-th cell sitting at position first_pos + k * stride."""
+    h = 0
+    pos = first_pos
+    for cell in line:
+        if cell != SPACE:
+            h ^= _ZOBRIST_KEYS.get((pos, cell)) or zobrist_key(pos, cell)
+        pos += stride
+    return h
+
+def grid_hash(grid: list[list[int]], transposed: bool = False) -> int:
+    """
+    64-bit Zobrist hash of a grid (blank cells contribute nothing).
+    transposed=True hashes the transpose of grid without building it.
+    """
+    num_rows, num_cols = len(grid), len(grid[0])
+    h = 0
+    for i, row in enumerate(grid):
+        row = tuple(row)
+        h ^= line_hash(row, i, num_rows) if transposed else line_hash(row, i * num_cols, 1)
+    return h
+
+# Transposing is the only symmetry the rules keep: evaluation always runs left to right / top to
+# bottom and subtraction does not commute, so mirrored boards play differently. Sliding a square
+# board left is sliding its transpose up, so moves of a canonical transposed board map back here.
+TRANSPOSED_MOVES = {"up": "left", "down": "right", "left": "up", "right": "down"}
+
+def canonical_grid_hash(grid: list[list[int]]) -> int:
+    """Smallest hash over the grid's rule-preserving symmetries: itself, and its transpose if square."""
+    h = grid_hash(grid)
+    if len(grid) != len(grid[0]):
+        return h
+    return min(h, grid_hash(grid, transposed=True))
+
 def out_of_bounds(grid: list[list[int]], upper_bound: int = 1000, lower_bound: int = -1000) -> bool:
     for row in grid:
         for el in row:
@@ -98,7 +316,11 @@ class Game:
         self._blank_spaces = [(i, j) for i in range(self._num_rows) for j in range(self._num_cols)
                               if self._grid[i][j] == SPACE]
 
-    def __init__(self, num_rows: int, num_cols: int):
+    def __init__(self, num_rows: int, num_cols: int, rng: random.Random = None, rules=None):
+        """
+        Pass rng to give this game its own spawn stream; without it spawns use the global random.
+        Pass a variants.RuleSet to play another rule variant; without it the game uses the rules below.
+        """
         self._grid = construct_grid(num_rows, num_cols, SPACE)
         self._num_rows = num_rows
         self._num_cols = num_cols
@@ -108,6 +330,19 @@ class Game:
         self._generated_digits = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
         self._num_generated_tiles = 2 # set this to somewhere between 2 to 4
         self._round_num = 1
+        self._line_cache = LINE_CACHE
+        self._line_moves = line_moves
+        if rules is not None:
+            compiled = rules.compile()
+            self._generated_operations = list(compiled.operations)
+            self._prob_operations = compiled.prob_operations
+            self._num_generated_tiles = compiled.tiles_per_turn
+            self._line_cache = compiled.line_cache
+            self._line_moves = compiled.line_moves
+        self._spawner = GLOBAL_SPAWNER if rng is None else TileSpawner(rng)
+        # Zobrist hashes of the grid and, for square boards, of its transpose; kept up to date on every change
+        self._hash = 0
+        self._transposed_hash = 0 if num_rows == num_cols else None
 
     def __str__(self):
         board = ""
@@ -131,8 +366,42 @@ class Game:
         else: 
             return str(character)
 
+    @classmethod
+    def from_grid(cls, grid: list[list[int]], rng: random.Random = None, rules=None) -> "Game":
+        """Restores a game from a saved grid (used as is, not copied) without spawning any tiles."""
+        game = cls(len(grid), len(grid[0]), rng, rules)
+        game.set_game(grid)
+        return game
+
     def set_game(self, grid) -> None:
         self._grid = grid
+        self.__update_blank_spaces()
+        self.__rehash()
+
+    def __rehash(self) -> None:
+        self._hash = grid_hash(self._grid)
+        if self._transposed_hash is not None:
+            self._transposed_hash = grid_hash(self._grid, transposed=True)
+
+    def board_hash(self) -> int:
+        """64-bit Zobrist hash of the current grid."""
+        return self._hash
+
+    def canonical_hash(self) -> int:
+        """
+        board_hash shared by every grid equivalent to this one under the rules (see canonical_grid_hash).
+        If it differs from board_hash the canonical board is the transpose, whose moves map through TRANSPOSED_MOVES.
+        """
+        if self._transposed_hash is None:
+            return self._hash
+        return min(self._hash, self._transposed_hash)
+
+    def enable_profiling(self, timer: PhaseTimer) -> None:
+        """Times this game's slides, spawns, move checks and win/loss checks into timer (see profiling.py)."""
+        instrument(self, timer, GAME_PHASES)
+
+    def disable_profiling(self) -> None:
+        uninstrument(self, GAME_PHASES)
 
     def generate_tiles(self) -> None:
         num_blank_spaces = len(self._blank_spaces)
@@ -140,100 +409,119 @@ class Game:
 
         # Select random indices without replacement and remove in reverse order
         # to avoid O(n) cost of pop() multiple times
-        selected_indices = random.sample(range(num_blank_spaces), num_tiles_to_generate)
+        tiles = self._spawner.sample_tiles(num_blank_spaces, num_tiles_to_generate, self._generated_operations,
+                                           self._generated_digits, self._prob_operations)
 
-        for cur_index in selected_indices:
+        for cur_index, tile in tiles:
             cur_pos = self._blank_spaces[cur_index]
-
-            if random.random() <= self._prob_operations:
-                self._grid[cur_pos[0]][cur_pos[1]] = random.choice(self._generated_operations)
-            else:
-                self._grid[cur_pos[0]][cur_pos[1]] = random.choice(self._generated_digits)
+            self._grid[cur_pos[0]][cur_pos[1]] = tile
+            self._hash ^= zobrist_key(cur_pos[0] * self._num_cols + cur_pos[1], tile)
+            if self._transposed_hash is not None:
+                self._transposed_hash ^= zobrist_key(cur_pos[1] * self._num_rows + cur_pos[0], tile)
 
         # Remove selected indices in reverse order to avoid index shifting issues
-        for idx in sorted(selected_indices, reverse=True):
+        for idx in sorted((cur_index for cur_index, tile in tiles), reverse=True):
             self._blank_spaces.pop(idx)
 
+    # Rows and columns are collapsed through the rules' line cache (LINE_CACHE by default); fresh
+    # lists are returned because generate_tiles writes into the grid in place
+    def __collapse_rows(self, to_end: bool) -> list[tuple[tuple[int, ...], tuple[int, ...]]]:
+        lookup = self._line_cache.lookup
+        return [lookup(tuple(row), to_end) for row in self._grid]
+
+    def __collapse_cols(self, to_end: bool) -> list[tuple[tuple[int, ...], tuple[int, ...]]]:
+        lookup = self._line_cache.lookup
+        return [lookup(col, to_end) for col in zip(*self._grid)]
+
+    @staticmethod
+    def __rows_to_grid(rows: list[tuple[tuple[int, ...], tuple[int, ...]]]) -> list[list[int]]:
+        return [list(row) for row, blanks in rows]
+
+    @staticmethod
+    def __cols_to_grid(cols: list[tuple[tuple[int, ...], tuple[int, ...]]]) -> list[list[int]]:
+        return [list(row) for row in zip(*(col for col, blanks in cols))]
+
     def left(self) -> list[list[int]]:
-        new_grid = []
-        for i in range(self._num_rows):
-            collapsed_row = collapse_list_left(remove_extra_spaces(self._grid[i]))
-            padding = [SPACE] * (self._num_cols - len(collapsed_row))
-            new_grid.append(collapsed_row + padding)
-        return new_grid
+        return self.__rows_to_grid(self.__collapse_rows(False))
 
     def right(self) -> list[list[int]]:
-        new_grid = []
-        for i in range(self._num_rows):
-            collapsed_row = collapse_list_right(remove_extra_spaces(self._grid[i]))
-            padding = [SPACE] * (self._num_cols - len(collapsed_row))
-            new_grid.append(padding + collapsed_row)
-        return new_grid
+        return self.__rows_to_grid(self.__collapse_rows(True))
 
     def up(self) -> list[list[int]]:
-        new_grid = construct_grid(self._num_rows, self._num_cols, SPACE)
-
-        for j in range(self._num_cols):
-            orig_col = [self._grid[i][j] for i in range(self._num_rows)]
-            collapsed_col = collapse_list_left(remove_extra_spaces(orig_col))
-            padding = [SPACE] * (self._num_rows - len(collapsed_col))
-            cur_col = collapsed_col + padding
-            for i in range(self._num_rows):
-                new_grid[i][j] = cur_col[i]
-
-        return new_grid
+        return self.__cols_to_grid(self.__collapse_cols(False))
 
     def down(self) -> list[list[int]]:
-        new_grid = construct_grid(self._num_rows, self._num_cols, SPACE)
+        return self.__cols_to_grid(self.__collapse_cols(True))
 
-        for j in range(self._num_cols):
-            orig_col = [self._grid[i][j] for i in range(self._num_rows)]
-            collapsed_col = collapse_list_right(remove_extra_spaces(orig_col))
-            padding = [SPACE] * (self._num_rows - len(collapsed_col))
-            cur_col = padding + collapsed_col
-            for i in range(self._num_rows):
-                new_grid[i][j] = cur_col[i]
-
-        return new_grid
+    def num_blank(self) -> int:
+        return len(self._blank_spaces)
 
     def get_valid_moves(self) -> list[str]:
-        valid_moves = []
-        if self.up() != self._grid:
-            valid_moves.append("up")
-        if self.down() != self._grid:
-            valid_moves.append("down")
-        if self.left() != self._grid:
-            valid_moves.append("left")
-        if self.right() != self._grid:
-            valid_moves.append("right")
-        return valid_moves
-
-    def slide_up(self) -> None:
-        new_grid = self.up()
+        line_moves = self._line_moves
+        can_left = can_right = False
+        for row in self._grid:
+            row_left, row_right = line_moves(row)
+            can_left = can_left or row_left
+            can_right = can_right or row_right
+            if can_left and can_right:
+                break
+
+        can_up = can_down = False
+        for col in zip(*self._grid):
+            col_up, col_down = line_moves(col)
+            can_up = can_up or col_up
+            can_down = can_down or col_down
+            if can_up and can_down:
+                break
+
+        return [move for move, valid in (("up", can_up), ("down", can_down), ("left", can_left), ("right", can_right))
+                if valid]
+
+    def get_successors(self) -> dict[str, list[list[int]]]:
+        """Maps each valid move to the grid it produces (for lookahead; slide_* recomputes from the line cache)."""
+        return {move: getattr(self, move)() for move in self.get_valid_moves()}
+
+    # The blank list of a slid board comes from the cached blank offsets of its new lines,
+    # kept in row-major order like __update_blank_spaces, instead of rescanning every cell.
+    # Hashes are updated only for the lines that changed.
+    def __slide_rows(self, to_end: bool) -> None:
+        rows = self.__collapse_rows(to_end)
+        new_grid = self.__rows_to_grid(rows)
         if new_grid != self._grid:
+            for i, (old_row, (new_row, blanks)) in enumerate(zip(map(tuple, self._grid), rows)):
+                if old_row != new_row:
+                    self._hash ^= line_hash(old_row, i * self._num_cols, 1) ^ line_hash(new_row, i * self._num_cols, 1)
+                    if self._transposed_hash is not None:
+                        self._transposed_hash ^= line_hash(old_row, i, self._num_rows) ^ line_hash(new_row, i, self._num_rows)
             self._grid = new_grid
-            self.__update_blank_spaces()
+            self._blank_spaces = [(i, j) for i, (row, blanks) in enumerate(rows) for j in blanks]
 
-    def slide_down(self) -> None:
-        new_grid = self.down()
+    def __slide_cols(self, to_end: bool) -> None:
+        cols = self.__collapse_cols(to_end)
+        new_grid = self.__cols_to_grid(cols)
         if new_grid != self._grid:
+            for j, (old_col, (new_col, blanks)) in enumerate(zip(zip(*self._grid), cols)):
+                if old_col != new_col:
+                    self._hash ^= line_hash(old_col, j, self._num_cols) ^ line_hash(new_col, j, self._num_cols)
+                    if self._transposed_hash is not None:
+                        self._transposed_hash ^= line_hash(old_col, j * self._num_rows, 1) ^ line_hash(new_col, j * self._num_rows, 1)
             self._grid = new_grid
-            self.__update_blank_spaces()
+            self._blank_spaces = sorted((i, j) for j, (col, blanks) in enumerate(cols) for i in blanks)
+
+    def slide_up(self) -> None:
+        self.__slide_cols(False)
+
+    def slide_down(self) -> None:
+        self.__slide_cols(True)
 
     def slide_left(self) -> None:
-        new_grid = self.left()
-        if new_grid != self._grid:
-            self._grid = new_grid
-            self.__update_blank_spaces()
+        self.__slide_rows(False)
 
     def slide_right(self) -> None:
-        new_grid = self.right()
-        if new_grid != self._grid:
-            self._grid = new_grid
-            self.__update_blank_spaces()
+        self.__slide_rows(True)
 
     def is_won(self) -> bool:
-        return any(self._grid[i][j] == 67 for i in range(self._num_rows) for j in range(self._num_cols))
+        return any(67 in row for row in self._grid)
 
     def is_lost(self, valid_moves: list[str] = None) -> bool:
         """Check if game is lost. Optionally pass valid_moves to avoid recalculation."""
@@ -283,8 +571,9 @@ def human_play(num_rows: int, num_cols: int) -> bool:
 def random_bot(grid: list[list[int]], valid_moves: list[str]) -> None:
     return random.choice(valid_moves)
 
-def auto_play(num_rows: int, num_cols: int, max_turns_per_game : int = 1000, model: callable = random_bot) -> list[int]:
-    game = Game(num_rows, num_cols)
+def auto_play(num_rows: int, num_cols: int, max_turns_per_game : int = 1000, model: callable = random_bot,
+              rng: random.Random = None, rules=None) -> list[int]:
+    game = Game(num_rows, num_cols, rng, rules)
     round_num = 1
 
     while max_turns_per_game >= round_num:
@@ -313,7 +602,7 @@ def auto_play(num_rows: int, num_cols: int, max_turns_per_game : int = 1000, mod
 
     return [0, round_num]
 
-def bot_trials(num_rows: int, num_cols: int, num_trials: int, model: callable = random_bot) -> None:
+def bot_trials(num_rows: int, num_cols: int, num_trials: int, model: callable = random_bot, rules=None) -> None:
     # metrics: 
     wins = 0
     losses = 0
@@ -322,7 +611,7 @@ def bot_trials(num_rows: int, num_cols: int, num_trials: int, model: callable =
 
     # run trials
     for i in range(num_trials):
-        cur_result = auto_play(num_rows, num_cols, model=model)
+        cur_result = auto_play(num_rows, num_cols, model=model, rules=rules)
         if cur_result[0] == 1:
             wins += 1
             win_moves += cur_result[1]
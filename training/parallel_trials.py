@@ -0,0 +1,197 @@
+import multiprocessing
+import random
+import time
+from typing import Iterator
+
+import numpy as np
+
+from game import Game, auto_play, random_bot
+
+def _apply_move(game: Game, move: str) -> None:
+    # Same move parsing as auto_play
+    if move == "up" or move == "u":
+        game.slide_up()
+    elif move == "down" or move == "d":
+        game.slide_down()
+    elif move == "left" or move == "l":
+        game.slide_left()
+    else:
+        game.slide_right()
+
+def _play_seeded_game(args: tuple) -> tuple[int, int, int]:
+    """Plays one auto_play game from its own seed. Returns (game index, won, number of moves)."""
+    game_index, seed, num_rows, num_cols, max_turns_per_game, model = args
+    random.seed(seed)   # for models that draw from the global random, like random_bot
+    won, num_moves = auto_play(num_rows, num_cols, max_turns_per_game, model, random.Random(seed))
+    return game_index, won, num_moves
+
+def play_batched(num_rows: int, num_cols: int, num_games: int, batch_model: callable,
+                 max_turns_per_game: int = 1000, batch_size: int = 256,
+                 seed: int = None) -> Iterator[tuple[int, int, int]]:
+    """
+    Plays num_games auto_play games in lockstep, up to batch_size at a time, so batch_model is
+    queried once per tick for every in-flight game instead of once per board.
+
+    batch_model(grids, valid_moves) receives parallel lists and returns one move per game.
+    Yields (game index, won, number of moves) as games finish; each game follows auto_play's rules.
+    If seed is given, game i spawns tiles from random.Random(seed + i), otherwise from the global random.
+    """
+    next_game = 0
+    active = []     # [game index, Game, round number]
+
+    while active or next_game < num_games:
+        while len(active) < batch_size and next_game < num_games:
+            rng = None if seed is None else random.Random(seed + next_game)
+            active.append([next_game, Game(num_rows, num_cols, rng), 1])
+            next_game += 1
+
+        waiting, grids, valid_moves = [], [], []
+        for entry in active:
+            game_index, game, round_num = entry
+            game.generate_tiles()
+            cur_valid_moves = game.get_valid_moves()
+            if len(cur_valid_moves) == 0:
+                yield game_index, 0, round_num
+            else:
+                waiting.append(entry)
+                grids.append(game._grid)
+                valid_moves.append(cur_valid_moves)
+
+        active = []
+        if not waiting:
+            continue
+
+        for entry, move in zip(waiting, batch_model(grids, valid_moves)):
+            game_index, game, round_num = entry
+            _apply_move(game, move)
+            if game.is_won():
+                yield game_index, 1, round_num
+            elif game.is_lost():
+                yield game_index, 0, round_num
+            elif round_num + 1 > max_turns_per_game:
+                yield game_index, 0, round_num + 1
+            else:
+                entry[2] += 1
+                active.append(entry)
+
+def _iter_batched_shard(args: tuple) -> Iterator[tuple[int, int, int]]:
+    first_index, num_games, seed, num_rows, num_cols, max_turns_per_game, batch_model, batch_size = args
+    random.seed(seed + first_index)     # for batch models that draw from the global random
+    for game_index, won, num_moves in play_batched(num_rows, num_cols, num_games, batch_model, max_turns_per_game,
+                                                   batch_size, seed + first_index):
+        yield first_index + game_index, won, num_moves
+
+def _play_batched_shard(args: tuple) -> list[tuple[int, int, int]]:
+    return list(_iter_batched_shard(args))
+
+def iter_trials(num_rows: int, num_cols: int, num_trials: int, model: callable = random_bot,
+                num_workers: int = None, seed: int = 0, max_turns_per_game: int = 1000,
+                batch_model: callable = None, batch_size: int = 256) -> Iterator[tuple[int, int, int]]:
+    """
+    Streams (game index, won, number of moves) for num_trials games sharded across a process pool.
+
+    Args:
+        model: Per-board auto_play callback, model(grid, valid_moves) -> move. Must be picklable
+               (a module-level function) when num_workers > 1
+        num_workers: Worker processes; defaults to the CPU count, 1 plays in this process
+        seed: Game i spawns tiles from random.Random(seed + i) and the global random is reseeded
+              with seed + i for its moves, so results do not depend on num_workers
+        batch_model: If given, replaces model; games are split into shards of batch_size, and each
+                     shard is played in lockstep, querying batch_model(grids, valid_moves) once per
+                     tick (see play_batched). Must be picklable when num_workers > 1 (a module-level
+                     function, or SB3BatchModel for a saved stable-baselines3 model). Spawns are seeded
+                     per game and a batch model drawing from the global random is seeded per shard,
+                     so results do not depend on num_workers either
+        batch_size: Games per shard in batched mode
+    """
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+
+    if batch_model is None:
+        tasks = [(i, seed + i, num_rows, num_cols, max_turns_per_game, model) for i in range(num_trials)]
+        if num_workers == 1:
+            yield from map(_play_seeded_game, tasks)
+            return
+        with multiprocessing.Pool(num_workers) as pool:
+            chunk_size = max(1, num_trials // (num_workers * 8))
+            yield from pool.imap_unordered(_play_seeded_game, tasks, chunksize=chunk_size)
+        return
+
+    # Shards are small so that results stream back shard by shard rather than once per worker
+    tasks = [(first, min(batch_size, num_trials - first), seed, num_rows, num_cols, max_turns_per_game,
+              batch_model, batch_size) for first in range(0, num_trials, batch_size)]
+    if num_workers == 1:
+        for task in tasks:
+            yield from _iter_batched_shard(task)
+        return
+    with multiprocessing.Pool(num_workers) as pool:
+        for shard_results in pool.imap_unordered(_play_batched_shard, tasks):
+            yield from shard_results
+
+def parallel_bot_trials(num_rows: int, num_cols: int, num_trials: int, model: callable = random_bot, **kwargs) -> dict:
+    """Parallel bot_trials: same metrics and printout, computed from iter_trials (kwargs are passed on)."""
+    wins = 0
+    losses = 0
+    total_moves = 0
+    win_moves = 0
+
+    for game_index, won, num_moves in iter_trials(num_rows, num_cols, num_trials, model, **kwargs):
+        if won == 1:
+            wins += 1
+            win_moves += num_moves
+        else:
+            losses += 1
+        total_moves += num_moves
+
+    print(f"Wins: {wins}, Losses: {losses}, Average number of moves: {total_moves / num_trials}, Total win moves: {win_moves}")
+    return {"wins": wins, "losses": losses, "average_moves": total_moves / num_trials, "win_moves": win_moves}
+
+class SB3BatchModel:
+    """
+    A saved stable-baselines3 model as a batch_model: one predict call per tick for all boards.
+    Pickles as its path, so each worker process loads its own copy on first use.
+
+    Args:
+        path: Path the model was saved to with model.save
+        algorithm: The model's class, e.g. PPO or MaskablePPO
+        env_kwargs: SixSevenEnv arguments the model was trained with (its observation encoding)
+    """
+
+    def __init__(self, path: str, algorithm: type, env_kwargs: dict = None):
+        self.path = path
+        self.algorithm = algorithm
+        self.env_kwargs = env_kwargs or {}
+        self._model = None
+        self._env = None
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path, "algorithm": self.algorithm, "env_kwargs": self.env_kwargs,
+                "_model": None, "_env": None}
+
+    def __call__(self, grids: list[list[list[int]]], valid_moves: list[list[str]]) -> list[str]:
+        if self._model is None:
+            from sixseven_env import SixSevenEnv
+            self._env = SixSevenEnv(**self.env_kwargs)
+            self._model = self.algorithm.load(self.path, device="cpu")
+        observations = np.stack([self._env._get_observation(grid) for grid in grids])
+        actions, _ = self._model.predict(observations, deterministic=True)
+        return [self._env.action_map[int(action)] for action in actions]
+
+def random_batch_bot(grids: list[list[list[int]]], valid_moves: list[list[str]]) -> list[str]:
+    return [random.choice(cur_valid_moves) for cur_valid_moves in valid_moves]
+
+
+if __name__ == "__main__":
+    from game import bot_trials
+
+    start = time.time()
+    bot_trials(6, 7, 2000)
+    print("bot_trials took:", time.time() - start, "seconds")
+
+    start = time.time()
+    parallel_bot_trials(6, 7, 2000)
+    print("parallel_bot_trials took:", time.time() - start, "seconds")
+
+    start = time.time()
+    parallel_bot_trials(6, 7, 2000, batch_model=random_batch_bot)
+    print("parallel_bot_trials (batched) took:", time.time() - start, "seconds")
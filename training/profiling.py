@@ -0,0 +1,84 @@
+import time
+from collections import defaultdict
+
+# Opt-in per-phase timing for Game and SixSevenEnv. Profiling replaces the profiled methods of one
+# instance with timed wrappers (instance attributes shadow the class's methods), so instances that
+# are not profiled run the original methods with no checks at all.
+# Phases nest: env "step" includes the game phases it calls, and "is_lost" includes its is_won and
+# out_of_bounds scans, so compare a phase with "step" rather than adding phases up.
+
+# method name -> phase
+GAME_PHASES = {
+    "get_valid_moves": "get_valid_moves",
+    "slide_up": "slide",
+    "slide_down": "slide",
+    "slide_left": "slide",
+    "slide_right": "slide",
+    "generate_tiles": "generate_tiles",
+    "is_won": "is_won",
+    "is_lost": "is_lost",
+}
+ENV_PHASES = {
+    "step": "step",
+    "reset": "reset",
+    "_get_observation": "observation",
+    "_analyze_board": "analysis",
+}
+
+class PhaseTimer:
+    """Cumulative wall time and call counts per phase."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def add(self, phase: str, seconds: float, calls: int = 1) -> None:
+        self.seconds[phase] += seconds
+        self.calls[phase] += calls
+
+    def wrap(self, phase: str, func: callable) -> callable:
+        seconds, calls = self.seconds, self.calls
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds[phase] += perf_counter() - start
+                calls[phase] += 1
+        timed.__wrapped__ = func
+        return timed
+
+    def snapshot(self) -> dict[str, dict]:
+        """{phase: {"seconds": cumulative seconds, "calls": call count}}"""
+        return {phase: {"seconds": self.seconds[phase], "calls": self.calls[phase]} for phase in self.calls}
+
+    def merge(self, snapshot: dict[str, dict]) -> None:
+        """Adds another timer's snapshot (e.g. from a subprocess env) to this one."""
+        for phase, stats in snapshot.items():
+            self.add(phase, stats["seconds"], stats["calls"])
+
+    def reset(self) -> None:
+        # cleared in place: wrappers hold these dicts
+        self.seconds.clear()
+        self.calls.clear()
+
+    def summary(self, per: str = "step") -> str:
+        """One line per phase: calls and microseconds per `per` call, and share of `per`'s time."""
+        count = self.calls.get(per) or 1
+        total = self.seconds.get(per) or 1.0
+        lines = []
+        for phase in sorted(self.calls, key=self.seconds.get, reverse=True):
+            lines.append(f"{phase:<16} {self.calls[phase] / count:6.2f} calls/{per} "
+                         f"{self.seconds[phase] / count * 1e6:9.1f} us/{per} {self.seconds[phase] / total:7.1%}")
+        return "\n".join(lines)
+
+def instrument(obj, timer: PhaseTimer, phases: dict[str, str]) -> None:
+    """Times obj's methods named in phases (method name -> phase) into timer, for this instance only."""
+    for method, phase in phases.items():
+        setattr(obj, method, timer.wrap(phase, getattr(type(obj), method).__get__(obj)))
+
+def uninstrument(obj, phases: dict[str, str]) -> None:
+    for method in phases:
+        obj.__dict__.pop(method, None)
@@ -0,0 +1,256 @@
+import math
+import random
+import time
+
+from game import SPACE, Game, TileSpawner, bot_trials, grid_hash, out_of_bounds, zobrist_key
+
+# Leaf values are scaled to [0, 1] so expectimax and MCTS share one evaluation
+WIN_VALUE = 1.0
+LOSS_VALUE = 0.0
+
+class BudgetExceeded(Exception):
+    pass
+
+def evaluate_grid(grid: list[list[int]], num_blank: int) -> float:
+    """
+    Heuristic value of a non-terminal after-state in (0.1, 0.9): more blank spaces and a number
+    closer to 67 are better (the same signals as SixSevenEnv's reward shaping).
+    """
+    numbers = [cell for row in grid for cell in row if cell <= 1000]
+    min_dist = min(abs(n - 67) for n in numbers) if numbers else 100
+    closeness = 1 - min(min_dist, 100) / 100
+    blank_frac = num_blank / (len(grid) * len(grid[0]))
+    return 0.1 + 0.8 * (0.5 * blank_frac + 0.5 * closeness)
+
+class SearchBot:
+    """
+    Shared plumbing for the search bots: a scratch Game whose grid is swapped in to slide,
+    a seeded spawner for sampling chance nodes, and the per-move node/time budget.
+    Search states are (grid, blank spaces, Zobrist hash) triples; the hash is updated
+    incrementally by the scratch Game and by _spawn.
+    Instances are auto_play models: bot(grid, valid_moves) -> move.
+    """
+
+    def __init__(self, max_nodes: int = None, time_limit: float = None, seed: int = None):
+        """
+        Args:
+            max_nodes: Maximum states expanded per move (None for no limit)
+            time_limit: Maximum seconds per move (None for no limit)
+            seed: Seeds the generator used to sample tile spawns during search
+        """
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self._rng = random.Random(seed)
+        self._spawner = TileSpawner(self._rng)
+        self._scratch = None
+        self._nodes = 0
+        self._deadline = None
+
+    def _start_move(self, grid: list[list[int]]) -> None:
+        if self._scratch is None or self._scratch._num_rows != len(grid) or self._scratch._num_cols != len(grid[0]):
+            self._scratch = Game(len(grid), len(grid[0]))
+            self._scratch._transposed_hash = None    # only board_hash is threaded through the search
+        self._nodes = 0
+        self._deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+
+    def _count_node(self) -> None:
+        self._nodes += 1
+        if self.max_nodes is not None and self._nodes > self.max_nodes:
+            raise BudgetExceeded()
+        if self._deadline is not None and self._nodes % 32 == 0 and time.perf_counter() > self._deadline:
+            raise BudgetExceeded()
+
+    def _valid_moves(self, grid: list[list[int]]) -> list[str]:
+        self._scratch._grid = grid
+        return self._scratch.get_valid_moves()
+
+    def _slide(self, grid: list[list[int]], blank_spaces: list, board_hash: int, move: str) -> tuple[list[list[int]], list, int]:
+        """After-state for a valid move; its blanks and hash come from the scratch Game's incremental trackers."""
+        self._scratch._grid = grid
+        self._scratch._blank_spaces = blank_spaces
+        self._scratch._hash = board_hash
+        getattr(self._scratch, f"slide_{move}")()
+        return self._scratch._grid, self._scratch._blank_spaces, self._scratch._hash
+
+    def _spawn(self, grid: list[list[int]], blank_spaces: list, board_hash: int) -> tuple[list[list[int]], list, int]:
+        """Samples one outcome of Game.generate_tiles on a copy of grid."""
+        num_tiles = min(len(blank_spaces), self._scratch._num_generated_tiles)
+        tiles = self._spawner.sample_tiles(len(blank_spaces), num_tiles, self._scratch._generated_operations,
+                                           self._scratch._generated_digits, self._scratch._prob_operations)
+        new_grid = [row[:] for row in grid]
+        for cur_index, tile in tiles:
+            i, j = blank_spaces[cur_index]
+            new_grid[i][j] = tile
+            board_hash ^= zobrist_key(i * self._scratch._num_cols + j, tile)
+        chosen = {cur_index for cur_index, tile in tiles}
+        return new_grid, [pos for k, pos in enumerate(blank_spaces) if k not in chosen], board_hash
+
+    def _terminal_value(self, grid: list[list[int]]) -> float:
+        """WIN_VALUE / LOSS_VALUE for an after-state auto_play would end on, else None."""
+        if any(67 in row for row in grid):
+            return WIN_VALUE
+        if out_of_bounds(grid) or not self._valid_moves(grid):
+            return LOSS_VALUE
+        return None
+
+def _blank_spaces(grid: list[list[int]]) -> list[tuple[int, int]]:
+    return [(i, j) for i, row in enumerate(grid) for j, cell in enumerate(row) if cell == SPACE]
+
+class ExpectimaxBot(SearchBot):
+    """
+    Depth-limited expectimax: max over moves, then a chance node averaging `samples` sampled
+    tile spawns. Searches with iterative deepening up to `depth` and plays the best move of the
+    deepest iteration that finished within the budget. Max-node values are kept in a
+    transposition table keyed by (Zobrist hash, depth), and moves are tried best-first by the
+    static value of their after-state.
+    """
+
+    def __init__(self, depth: int = 2, samples: int = 4, table_size: int = 200_000, **kwargs):
+        super().__init__(**kwargs)
+        self.depth = depth
+        self.samples = samples
+        self.table_size = table_size
+        self._table = {}
+
+    def _after_states(self, grid: list[list[int]], blank_spaces: list, board_hash: int, valid_moves: list[str]) -> list:
+        """[(static value, move, after-state grid, blanks, hash, terminal value)] best first."""
+        children = []
+        for move in valid_moves:
+            self._count_node()
+            child_grid, child_blanks, child_hash = self._slide(grid, blank_spaces, board_hash, move)
+            terminal = self._terminal_value(child_grid)
+            static = terminal if terminal is not None else evaluate_grid(child_grid, len(child_blanks))
+            children.append((static, move, child_grid, child_blanks, child_hash, terminal))
+        children.sort(key=lambda child: child[0], reverse=True)
+        return children
+
+    def _max_value(self, grid: list[list[int]], blank_spaces: list, board_hash: int, depth: int) -> float:
+        key = (board_hash, depth)
+        value = self._table.get(key)
+        if value is not None:
+            return value
+
+        valid_moves = self._valid_moves(grid)
+        if not valid_moves:
+            return LOSS_VALUE
+        value = max(self._child_value(child, depth) for child in self._after_states(grid, blank_spaces, board_hash, valid_moves))
+
+        if len(self._table) >= self.table_size:
+            self._table.clear()
+        self._table[key] = value
+        return value
+
+    def _child_value(self, child: tuple, depth: int) -> float:
+        static, move, child_grid, child_blanks, child_hash, terminal = child
+        if terminal is not None or depth <= 1:
+            return static
+        total = 0.0
+        for _ in range(self.samples):
+            spawned_grid, spawned_blanks, spawned_hash = self._spawn(child_grid, child_blanks, child_hash)
+            total += self._max_value(spawned_grid, spawned_blanks, spawned_hash, depth - 1)
+        return total / self.samples
+
+    def __call__(self, grid: list[list[int]], valid_moves: list[str]) -> str:
+        self._start_move(grid)
+        blank_spaces = _blank_spaces(grid)
+        best_move = valid_moves[0]
+        try:
+            children = self._after_states(grid, blank_spaces, grid_hash(grid), valid_moves)
+            best_move = children[0][1]
+            for depth in range(2, self.depth + 1):
+                values = [(self._child_value(child, depth), child[1]) for child in children]
+                best_move = max(values, key=lambda value: value[0])[1]
+        except BudgetExceeded:
+            pass
+        return best_move
+
+class MCTSNode:
+    __slots__ = ("visits", "value", "children")
+
+    def __init__(self):
+        self.visits = 0
+        self.value = 0.0
+        self.children = {}
+
+class MCTSBot(SearchBot):
+    """
+    Open-loop UCT: the tree is over move sequences and every iteration samples fresh tile spawns,
+    so chance nodes are handled by averaging. Leaves are scored with a short random rollout and
+    evaluate_grid. Plays the most visited root move once `iterations` or the budget run out.
+    The defaults play a 6x7 game in about 1.5 seconds on one CPU core.
+    """
+
+    def __init__(self, iterations: int = 25, rollout_depth: int = 1, exploration: float = 1.4, **kwargs):
+        super().__init__(**kwargs)
+        self.iterations = iterations
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+
+    def _rollout(self, grid: list[list[int]], blank_spaces: list, board_hash: int) -> float:
+        for _ in range(self.rollout_depth):
+            grid, blank_spaces, board_hash = self._spawn(grid, blank_spaces, board_hash)
+            valid_moves = self._valid_moves(grid)
+            if not valid_moves:
+                return LOSS_VALUE
+            self._count_node()
+            grid, blank_spaces, board_hash = self._slide(grid, blank_spaces, board_hash, self._rng.choice(valid_moves))
+            terminal = self._terminal_value(grid)
+            if terminal is not None:
+                return terminal
+        return evaluate_grid(grid, len(blank_spaces))
+
+    def _simulate(self, node: MCTSNode, grid: list[list[int]], blank_spaces: list, board_hash: int,
+                  valid_moves: list[str]) -> float:
+        untried = [move for move in valid_moves if move not in node.children]
+        if untried:
+            move = self._rng.choice(untried)
+            child = node.children[move] = MCTSNode()
+        else:
+            # Open loop: only the moves valid on this sampled board compete
+            children = [(move, node.children[move]) for move in valid_moves]
+            log_visits = math.log(sum(child.visits for move, child in children))
+            move, child = max(children, key=lambda item: item[1].value / item[1].visits +
+                              self.exploration * math.sqrt(log_visits / item[1].visits))
+
+        self._count_node()
+        child_grid, child_blanks, child_hash = self._slide(grid, blank_spaces, board_hash, move)
+        terminal = self._terminal_value(child_grid)
+        if terminal is not None:
+            value = terminal
+        elif untried:
+            value = self._rollout(child_grid, child_blanks, child_hash)
+        else:
+            spawned_grid, spawned_blanks, spawned_hash = self._spawn(child_grid, child_blanks, child_hash)
+            spawned_moves = self._valid_moves(spawned_grid)
+            if spawned_moves:
+                value = self._simulate(child, spawned_grid, spawned_blanks, spawned_hash, spawned_moves)
+            else:
+                value = LOSS_VALUE
+
+        child.visits += 1
+        child.value += value
+        node.visits += 1
+        return value
+
+    def __call__(self, grid: list[list[int]], valid_moves: list[str]) -> str:
+        self._start_move(grid)
+        blank_spaces = _blank_spaces(grid)
+        board_hash = grid_hash(grid)
+        root = MCTSNode()
+        try:
+            for _ in range(self.iterations):
+                self._simulate(root, grid, blank_spaces, board_hash, valid_moves)
+        except BudgetExceeded:
+            pass
+        if not root.children:
+            return valid_moves[0]
+        return max(root.children.items(), key=lambda item: item[1].visits)[0]
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    for name, bot in (("expectimax", ExpectimaxBot(depth=2, samples=3, seed=0)),
+                      ("mcts", MCTSBot(seed=0))):
+        start = time.time()
+        bot_trials(6, 7, 50, bot)
+        print(f"{name}: 50 games took", time.time() - start, "seconds")
@@ -1,13 +1,43 @@
+import itertools
+import logging
+import random
+from typing import NamedTuple
+
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
 
-from game import ADDITION, MULTIPLICATION, SPACE, SUBTRACTION, Game
+from game import ADDITION, MULTIPLICATION, SPACE, SUBTRACTION, Game, out_of_bounds
+from profiling import ENV_PHASES, PhaseTimer, instrument, uninstrument
+
+logger = logging.getLogger(__name__)
 
 # scaled down by 1000
 LOWER_BOUND = -1
 UPPER_BOUND = 1
 
+# Channels per cell: [value / 1000, space, +, -, *]
+NUM_CHANNELS = 5
+# Cell value -> kind: 1-4 for ADDITION..SPACE, 0 (number) for everything else once indices are clipped
+KIND_TABLE = np.zeros(SPACE + 2, dtype=np.intp)
+KIND_TABLE[[ADDITION, SUBTRACTION, MULTIPLICATION, SPACE]] = [1, 2, 3, 4]
+# Rows indexed by cell kind: 0 = number (value channel is written separately), 1-4 = ADDITION..SPACE
+ENCODING_TABLE = np.array([
+    [0, 0, 0, 0, 0],
+    [0, 0, 1, 0, 0],
+    [0, 0, 0, 1, 0],
+    [0, 0, 0, 0, 1],
+    [0, 1, 0, 0, 0],
+], dtype=np.float32)
+
+class BoardAnalysis(NamedTuple):
+    """Everything step needs to know about a board, from one pass over it (see SixSevenEnv._analyze_board)."""
+    valid_moves: list[str]
+    won: bool
+    out_of_bounds: bool     # game.out_of_bounds
+    min_dist: float         # distance from 67 to the closest number tile (1000.0 without number tiles)
+    num_blank: int
+
 class SixSevenEnv(gym.Env):
     """
     Gymnasium environment wrapper for the 67 game.
@@ -19,29 +49,42 @@ class SixSevenEnv(gym.Env):
     - Penalty for invalid moves
     """
 
-    def __init__(self, num_rows: int = 6, num_cols: int = 7):
+    def __init__(self, num_rows: int = 6, num_cols: int = 7, channels_first: bool = False,
+                 copy_observations: bool = True, rules=None, profile: bool = False):
         """
         Initialize the environment.
 
         Args:
             num_rows: Number of rows in the game grid
             num_cols: Number of columns in the game grid
+            channels_first: Observe a (5, rows, cols) array for CNN policies instead of a flat vector
+            copy_observations: If False, reset/step return the env's observation buffer itself,
+                               which is overwritten by the next call (callers must copy)
+            rules: A variants.RuleSet to train on another rule variant (default: game.py's rules)
+            profile: Time the env's and game's phases from the start (see enable_profiling)
         """
         super().__init__()
 
         self.num_rows = num_rows
         self.num_cols = num_cols
-        self.game = Game(num_rows, num_cols)
+        self.rules = rules
+        self.game = Game(num_rows, num_cols, rules=rules)
+        self._analysis = self._analyze_board()
 
         # Action space: 0=up, 1=down, 2=left, 3=right
         self.action_space = spaces.Discrete(4)
 
-        # Observation space: Grid represented as a flattened array of encoded values
-        # We'll encode: empty="", digits 0-9, operators +/-/* as unique integer values
-        # Empty: 0, Digits 0-9: 1-10, Operators +: 11, -: 12, *: 13
+        # Observation space: 5 values per cell (see _encode_cell), flattened or channels-first
+        self.channels_first = channels_first
+        self.copy_observations = copy_observations
+        if channels_first:
+            observation_shape = (NUM_CHANNELS, num_rows, num_cols)
+        else:
+            observation_shape = (num_rows * num_cols * NUM_CHANNELS,)
         self.observation_space = spaces.Box(
-            low=LOWER_BOUND, high=UPPER_BOUND, shape=(num_rows * num_cols * 5,), dtype=np.float32
+            low=LOWER_BOUND, high=UPPER_BOUND, shape=observation_shape, dtype=np.float32
         )
+        self._observation = np.zeros(observation_shape, dtype=np.float32)
 
         self.action_map = {0: "up", 1: "down", 2: "left", 3: "right"}
         self.steps = 0
@@ -49,6 +92,57 @@ class SixSevenEnv(gym.Env):
 
         self.current_min_dist = 1000.0
 
+        self.profiler = None
+        if profile:
+            self.enable_profiling()
+
+    def enable_profiling(self, timer: PhaseTimer = None, info_interval: int = 0, log_interval: int = 0) -> PhaseTimer:
+        """
+        Record cumulative time and call counts of each phase of step/reset, including the game's
+        (see profiling.py). Envs that never enable profiling run without any timing overhead.
+
+        Args:
+            timer: PhaseTimer to record into, e.g. one shared by several envs (default: a new one)
+            info_interval: Every this many steps, put a snapshot of the timer in info["profile"]
+            log_interval: Every this many steps, log the timer's summary at INFO level
+        Returns:
+            The timer in use
+        """
+        self.disable_profiling()
+        self.profiler = timer if timer is not None else PhaseTimer()
+        instrument(self, self.profiler, ENV_PHASES)
+        self.game.enable_profiling(self.profiler)
+
+        if info_interval or log_interval:
+            timed_step = self.step
+            profiled_steps = 0
+
+            def step(action):
+                nonlocal profiled_steps
+                result = timed_step(action)
+                profiled_steps += 1
+                if info_interval and profiled_steps % info_interval == 0:
+                    result[4]["profile"] = self.profiler.snapshot()
+                if log_interval and profiled_steps % log_interval == 0:
+                    logger.info("Phase timings after %d steps:\n%s", profiled_steps, self.profiler.summary())
+                return result
+            self.step = step
+        return self.profiler
+
+    def disable_profiling(self) -> None:
+        if self.profiler is not None:
+            uninstrument(self, ENV_PHASES)
+            self.game.disable_profiling()
+            self.profiler = None
+
+    def profile_snapshot(self) -> dict[str, dict]:
+        """The profiler's snapshot ({} when profiling is off); called through VecEnv.env_method by ProfilingCallback."""
+        return self.profiler.snapshot() if self.profiler is not None else {}
+
+    def reset_profile(self) -> None:
+        if self.profiler is not None:
+            self.profiler.reset()
+
     def _encode_cell(self, cell_value: int) -> list[float]:
         """Stores 5 values: cell value if number, else one-hot for +,-,* or space"""
         if cell_value == SPACE:
@@ -62,23 +156,38 @@ class SixSevenEnv(gym.Env):
         else:  # digit 0-9
             return [cell_value / 1000, 0, 0, 0, 0]
 
-    def _get_observation(self, grid: list[list[str]] = None) -> np.ndarray:
-        """Convert game grid to observation array."""
-        if grid is None:    # allows for conversion of arbitrary grid
+    def _get_observation(self, grid: list[list[int]] = None) -> np.ndarray:
+        """
+        Convert game grid to observation array, matching _encode_cell cell by cell.
+        The env's own grid is encoded into a preallocated buffer; an arbitrary grid gets a new array.
+        """
+        if grid is None:
             grid = self.game._grid
+            observation = self._observation
+        else:    # allows for conversion of arbitrary grid
+            observation = np.empty_like(self._observation)
+        cells = np.fromiter(itertools.chain.from_iterable(grid), dtype=np.int64, count=self.num_rows * self.num_cols)
+        cells = cells.reshape(self.num_rows, self.num_cols)
+
+        # One-hot channels come from ENCODING_TABLE, indexed by cell kind
+        kind = np.take(KIND_TABLE, cells, mode="clip")
+        if self.channels_first:
+            np.take(ENCODING_TABLE.T, kind, axis=1, out=observation, mode="clip")
+            values = observation[0]
+        else:
+            cell_view = observation.reshape(self.num_rows, self.num_cols, NUM_CHANNELS)
+            np.take(ENCODING_TABLE, kind, axis=0, out=cell_view, mode="clip")
+            values = cell_view[..., 0]
+        np.divide(cells, 1000, out=values, where=kind == 0)
 
-        # Flatten and encode in one pass using list comprehension
-        encoded = [encoded_val
-                   for row in grid
-                   for cell in row
-                   for encoded_val in self._encode_cell(cell)]
-
-        return np.array(encoded, dtype=np.float32)
+        if grid is None and self.copy_observations:
+            return observation.copy()
+        return observation
 
     def _get_info(self):
         """Get info dictionary."""
         return {
-            "valid_moves": self.game.get_valid_moves(),
+            "valid_moves": list(self._analysis.valid_moves),
             "steps": self.steps,
         }
 
@@ -90,52 +199,56 @@ class SixSevenEnv(gym.Env):
             info: Info dictionary
         """
         super().reset(seed=seed)
-        self.game = Game(self.num_rows, self.num_cols)
+        # Spawns come from np_random, so reset(seed=...) makes the whole episode reproducible
+        self.game = Game(self.num_rows, self.num_cols, random.Random(int(self.np_random.integers(2**63))),
+                         self.rules)
+        if self.profiler is not None:
+            self.game.enable_profiling(self.profiler)
         self.game.generate_tiles()
         self.steps = 0
-        
-        # OPTIMIZATION: Initialize the cache
-        self.current_min_dist = self._calculate_min_distance()
+
+        self._analysis = self._analyze_board()
+        self.current_min_dist = self._analysis.min_dist
 
         observation = self._get_observation()
         info = self._get_info()
         info["win"] = 0
         return observation, info
 
-    def _calculate_min_distance(self) -> float:
+    def _analyze_board(self) -> BoardAnalysis:
         """
-        Optimized scanner:
-        1. Flattens grid using list comprehension (faster than nested for-loops).
-        2. Uses integer comparison (<= 1000) to filter out Operators/Spaces instantly.
+        Valid moves (from the game's line scanner) plus one pass over the number tiles for the win,
+        out-of-bounds, min-distance and blank-count checks that is_won, is_lost and the reward use.
         """
-        # Extract only valid numbers (ignore operators 1001+ and SPACE 1004)
-        numbers = [
-            cell for row in self.game._grid 
-            for cell in row 
-            if cell <= 1000
-        ]
-        
+        # Number tiles only: operators and SPACE are 1001..1004
+        numbers = [cell for row in self.game._grid for cell in row if cell < ADDITION or cell > SPACE]
         if not numbers:
-            return 1000.0 # Default penalty if board is empty (rare)
-            
-        # Find min distance to 67
-        return min(abs(n - 67) for n in numbers)
+            return BoardAnalysis(self.game.get_valid_moves(), False, False, 1000.0, self.game.num_blank())
+
+        low, high = min(numbers), max(numbers)
+        if high > 1000:     # tiles above 1000 count as out of bounds but not towards the distance
+            in_range = [n for n in numbers if n <= 1000]
+            min_dist = min(abs(n - 67) for n in in_range) if in_range else 1000.0
+        else:
+            min_dist = min(abs(n - 67) for n in numbers)
+        return BoardAnalysis(self.game.get_valid_moves(), min_dist == 0, low < -1000 or high > 1000, min_dist,
+                             self.game.num_blank())
 
     def step(self, action):
         self.steps += 1
-        
-        # 1. Use Cached State (No calculation needed here!)
-        prev_dist = self.current_min_dist
-        
-        valid_moves = self.game.get_valid_moves()
+
+        # The board has not changed since the last analysis (from reset or the previous step),
+        # so its valid moves are the legal moves now
+        prev = self._analysis
         move_name = self.action_map[action]
 
         reward = 0.0
-        
-        if move_name not in valid_moves:
-            reward = -5.0 
+
+        if move_name not in prev.valid_moves:
+            reward = -5.0
             # Optional: Terminate on invalid move to speed up training significantly
             # return self._get_observation(), reward, True, False, self._get_info()
+            analysis = prev
         else:
             # Execute move
             if move_name == "up": self.game.slide_up()
@@ -144,21 +257,17 @@ class SixSevenEnv(gym.Env):
             else: self.game.slide_right()
 
             self.game.generate_tiles()
-            
-            # 2. Calculate New State ONCE
-            curr_dist = self._calculate_min_distance()
-            
-            # Update Cache for the next step
-            self.current_min_dist = curr_dist
+
+            # One pass over the new board serves the reward, the terminal checks and info
+            analysis = self._analysis = self._analyze_board()
+            self.current_min_dist = analysis.min_dist
 
             # Shaping Reward: Positive if we got closer, negative if further
             # Scale by 0.1 (e.g., 10 units closer = +1.0 reward)
-            reward += (prev_dist - curr_dist) * 0.1
+            reward += (prev.min_dist - analysis.min_dist) * 0.1
 
             # Living Reward (Encourage keeping empty spaces)
-            # Use cached blank_spaces count instead of counting cells
-            empty_spaces = len(self.game._blank_spaces)
-            reward += empty_spaces * 0.01
+            reward += analysis.num_blank * 0.01
 
         # 3. Check Terminal States
         terminated = False
@@ -166,11 +275,13 @@ class SixSevenEnv(gym.Env):
         info = self._get_info()
         info["win"] = 0
 
-        if self.game.is_won():
+        if analysis.won:
             reward += 100.0
             info["win"] = 1
             terminated = True
-        elif self.game.is_lost(valid_moves):
+        # game.is_lost with the moves that were legal before this step: a board left without moves
+        # ends the episode on the next step
+        elif len(prev.valid_moves) == 0 or analysis.out_of_bounds:
             reward -= 50.0
             terminated = True
         elif self.steps >= self.max_steps:
@@ -178,6 +289,16 @@ class SixSevenEnv(gym.Env):
 
         return self._get_observation(), reward, terminated, truncated, info
 
+    def action_masks(self) -> np.ndarray:
+        """
+        Legal actions for MaskablePPO (sb3_contrib), from the analysis the next step will check moves against.
+        A board without legal moves loses on the next step whatever the action, so then every action is allowed.
+        """
+        valid_moves = self._analysis.valid_moves
+        if not valid_moves:
+            return np.ones(4, dtype=bool)
+        return np.array([self.action_map[action] in valid_moves for action in range(4)])
+
     def render(self):
         """Render the current game state."""
         print(self.game)
@@ -187,8 +308,107 @@ class SixSevenEnv(gym.Env):
         pass
 
 
+def _check_analysis(env: SixSevenEnv) -> None:
+    """Raises AssertionError if env._analyze_board disagrees with the game's own checks on env's board."""
+    analysis = env._analyze_board()
+    numbers = [cell for row in env.game._grid for cell in row if cell <= 1000]
+    assert analysis.valid_moves == env.game.get_valid_moves()
+    assert analysis.won == env.game.is_won()
+    assert analysis.out_of_bounds == out_of_bounds(env.game._grid)
+    assert analysis.min_dist == (min(abs(n - 67) for n in numbers) if numbers else 1000.0)
+    assert analysis.num_blank == sum(row.count(SPACE) for row in env.game._grid)
+
+def _legacy_step(env: SixSevenEnv, action: int) -> tuple:
+    """SixSevenEnv.step before BoardAnalysis: separate valid-move, win, loss and min-distance scans."""
+    env.steps += 1
+    prev_dist = env.current_min_dist
+    valid_moves = env.game.get_valid_moves()
+    move_name = env.action_map[action]
+
+    reward = 0.0
+    if move_name not in valid_moves:
+        reward = -5.0
+    else:
+        getattr(env.game, f"slide_{move_name}")()
+        env.game.generate_tiles()
+        numbers = [cell for row in env.game._grid for cell in row if cell <= 1000]
+        curr_dist = min(abs(n - 67) for n in numbers) if numbers else 1000.0
+        env.current_min_dist = curr_dist
+        reward += (prev_dist - curr_dist) * 0.1
+        reward += env.game.num_blank() * 0.01
+
+    terminated = False
+    truncated = False
+    info = {"valid_moves": env.game.get_valid_moves(), "steps": env.steps, "win": 0}
+    if env.game.is_won():
+        reward += 100.0
+        info["win"] = 1
+        terminated = True
+    elif env.game.is_lost(valid_moves):
+        reward -= 50.0
+        terminated = True
+    elif env.steps >= env.max_steps:
+        truncated = True
+    return env._get_observation(), reward, terminated, truncated, info
+
+def differential_check(num_steps: int, seed: int = 0, rules=None) -> None:
+    """
+    Steps two envs reset with the same seeds through the same random actions, one with step and one
+    with _legacy_step, and raises AssertionError on the first difference in observation, reward,
+    terminated, truncated or info. Also checks every new board's analysis against the game's checks.
+    """
+    env, legacy_env = SixSevenEnv(rules=rules), SixSevenEnv(rules=rules)
+    rng = random.Random(seed)
+    episode = 0
+    done = True
+    for _ in range(num_steps):
+        if done:
+            observation, info = env.reset(seed=seed + episode)
+            legacy_observation, legacy_info = legacy_env.reset(seed=seed + episode)
+            assert np.array_equal(observation, legacy_observation) and info == legacy_info
+            episode += 1
+        action = rng.randrange(4)
+        observation, reward, terminated, truncated, info = env.step(action)
+        expected = _legacy_step(legacy_env, action)
+        assert np.array_equal(observation, expected[0]), f"episode {episode}, step {env.steps}: observation"
+        assert (reward, terminated, truncated, info) == expected[1:], \
+            f"episode {episode}, step {env.steps}: {(reward, terminated, truncated, info)} != {expected[1:]}"
+        _check_analysis(env)
+        done = terminated or truncated
+
+
 if __name__ == "__main__":
     import time
+    from variants import VARIANTS
+
+    # The single-pass step against the old step, on random play under every rule variant
+    for variant, rules in VARIANTS.items():
+        differential_check(20000, rules=rules)
+    # and the analysis on boards with out-of-range tiles
+    env = SixSevenEnv()
+    env.reset(seed=0)
+    for cells in ([67, 1500], [-1001, 5], [1200], [SPACE], [1000, ADDITION, -1000]):
+        env.game.set_game([cells + [SPACE] * (env.num_cols - len(cells))] + [[SPACE] * env.num_cols] * (env.num_rows - 1))
+        _check_analysis(env)
+    print("Single-pass step matches the old step and the game's checks")
+
+    # Encoder micro-benchmark: the list-based encoder this env used to have vs _get_observation
+    env = SixSevenEnv()
+    env.reset(seed=0)
+    for i in range(20):
+        env.step(env.action_space.sample())
+
+    def list_observation(grid: list[list[int]]) -> np.ndarray:
+        return np.array([value for row in grid for cell in row for value in env._encode_cell(cell)], dtype=np.float32)
+
+    assert np.array_equal(list_observation(env.game._grid), env._get_observation())
+    for name, encode in (("list encoder", lambda: list_observation(env.game._grid)),
+                         ("buffer encoder", env._get_observation)):
+        start = time.time()
+        for i in range(20000):
+            encode()
+        print(f"{name}: {(time.time() - start) / 20000 * 1e6:.1f} us per observation")
+
     env = SixSevenEnv()
 
     obs = env.reset()
@@ -0,0 +1,78 @@
+import argparse
+import time
+
+from sb3_contrib import MaskablePPO
+from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import VecMonitor
+
+from callbacks import ProfilingCallback
+from sixseven_env import SixSevenEnv
+from variants import VARIANTS
+from vec_env import SixSevenVecEnv
+
+# MaskablePPO on SixSevenEnv: the policy only samples legal moves (env.action_masks()), so no
+# samples are spent on invalid moves and their -5 no-op steps.
+#
+#   python train_maskable.py --timesteps 500000 --num-envs 64 --batched --save models/maskable_ppo_sixseven
+#   tensorboard --logdir runs
+
+def make_env(num_envs: int, batched: bool, variant: str = None, seed: int = None):
+    """Monitored VecEnv of SixSevenEnvs, or one SixSevenVecEnv if batched (default rules only)."""
+    if batched:
+        if variant is not None:
+            raise ValueError("SixSevenVecEnv only plays the default rules")
+        env = SixSevenVecEnv(num_envs)
+        env.seed(seed)
+        return VecMonitor(env, info_keywords=("win",))
+    rules = VARIANTS[variant] if variant is not None else None
+    return make_vec_env(SixSevenEnv, n_envs=num_envs, seed=seed, env_kwargs={"rules": rules},
+                        monitor_kwargs={"info_keywords": ("win",)})
+
+def evaluate(model: MaskablePPO, num_episodes: int, variant: str = None, seed: int = 0) -> dict:
+    """Plays num_episodes masked, deterministic episodes on SixSevenEnv."""
+    env = SixSevenEnv(rules=VARIANTS[variant] if variant is not None else None)
+    wins = steps = invalid = 0
+    for episode in range(num_episodes):
+        observation, info = env.reset(seed=seed + episode)
+        done = False
+        while not done:
+            action, _ = model.predict(observation, action_masks=env.action_masks(), deterministic=True)
+            # without legal moves every action is allowed and the episode ends, so that is not counted
+            invalid += bool(info["valid_moves"]) and env.action_map[int(action)] not in info["valid_moves"]
+            observation, reward, terminated, truncated, info = env.step(int(action))
+            steps += 1
+            done = terminated or truncated
+        wins += info["win"]
+    return {"win_rate": wins / num_episodes, "mean_length": steps / num_episodes, "invalid_moves": invalid}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train MaskablePPO on SixSevenEnv")
+    parser.add_argument("--timesteps", type=int, default=500_000)
+    parser.add_argument("--num-envs", type=int, default=8)
+    parser.add_argument("--batched", action="store_true", help="Step all boards in one SixSevenVecEnv")
+    parser.add_argument("--variant", choices=list(VARIANTS), help="Rule variant (see variants.py)")
+    parser.add_argument("--n-steps", type=int, default=256, help="Rollout steps per env")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tensorboard", default=None, help="TensorBoard log directory (e.g. runs)")
+    parser.add_argument("--profile", action="store_true", help="Log env phase timings (not with --batched)")
+    parser.add_argument("--save", default=None, help="Save the model to this path")
+    parser.add_argument("--eval-episodes", type=int, default=100)
+    args = parser.parse_args()
+    if args.profile and args.batched:
+        parser.error("--profile times SixSevenEnv phases, which SixSevenVecEnv does not have")
+
+    env = make_env(args.num_envs, args.batched, args.variant, args.seed)
+    model = MaskablePPO("MlpPolicy", env, n_steps=args.n_steps, seed=args.seed, verbose=1,
+                        tensorboard_log=args.tensorboard)
+
+    start = time.time()
+    model.learn(args.timesteps, callback=ProfilingCallback() if args.profile else None)
+    elapsed = time.time() - start
+    print(f"Trained {args.timesteps} steps in {elapsed:.0f} seconds ({args.timesteps / elapsed:.0f} steps/second)")
+
+    if args.save:
+        model.save(args.save)
+    if args.eval_episodes:
+        results = evaluate(model, args.eval_episodes, args.variant)
+        print(f"Win rate {results['win_rate']:.1%} over {args.eval_episodes} episodes, "
+              f"{results['mean_length']:.1f} moves per episode, {results['invalid_moves']} invalid moves")
@@ -0,0 +1,265 @@
+import functools
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from typing import NamedTuple
+
+from game import (ADDITION, LINE_CACHE, MULTIPLICATION, OPERATORS, SPACE, SUBTRACTION, LineCache, auto_play,
+                  evaluate, line_moves)
+
+# Rule variants of the game behind one engine. The README's versions differ in
+#   - gaps:          whether "8 + _ 0" collapses to 8 (ignore_gaps) or only slides to "8 + 0" (the original)
+#   - operator runs: "none" leaves "+ + + +" alone, "partial" halves it to "+ +" (game_modified_2)
+#                    and "full" collapses it to "+" (game.py)
+#   - spawns:        which operators spawn, how often a tile is an operator, and tiles per turn
+# A RuleSet compiles to a line-collapse routine assembled for its gap and run settings, with a
+# LineCache and a valid-move scanner per routine, so every variant plays on int cells through Game.
+OPERATOR_SET = frozenset(OPERATORS)
+OPERATOR_RUNS = ("none", "partial", "full")
+
+def _squeeze_none(tiles: list[int]) -> list[int]:
+    return tiles
+
+def _squeeze_partial(tiles: list[int]) -> list[int]:
+    """Each pair of equal adjacent operators becomes one, scanning left to right."""
+    result = []
+    i = 0
+    while i < len(tiles):
+        cell = tiles[i]
+        result.append(cell)
+        i += 2 if cell in OPERATOR_SET and i + 1 < len(tiles) and tiles[i + 1] == cell else 1
+    return result
+
+def _squeeze_full(tiles: list[int]) -> list[int]:
+    """Each run of equal adjacent operators becomes one."""
+    result = []
+    prev = SPACE
+    for cell in tiles:
+        if cell != prev or cell not in OPERATOR_SET:
+            result.append(cell)
+        prev = cell
+    return result
+
+SQUEEZERS = {"none": _squeeze_none, "partial": _squeeze_partial, "full": _squeeze_full}
+
+def _reduce_left(tiles: list[int]) -> list[int]:
+    result = []
+    i = 0
+    while i < len(tiles):
+        if (i < len(tiles) - 2 and tiles[i] not in OPERATOR_SET and tiles[i + 1] in OPERATOR_SET
+                and tiles[i + 2] not in OPERATOR_SET):
+            result.append(evaluate(tiles[i], tiles[i + 1], tiles[i + 2]))
+            i += 3
+        else:
+            result.append(tiles[i])
+            i += 1
+    return result
+
+def _reduce_right(tiles: list[int]) -> list[int]:
+    result = []
+    i = len(tiles) - 1
+    while i >= 0:
+        if i >= 2 and tiles[i] not in OPERATOR_SET and tiles[i - 1] in OPERATOR_SET and tiles[i - 2] not in OPERATOR_SET:
+            result.append(evaluate(tiles[i - 2], tiles[i - 1], tiles[i]))
+            i -= 3
+        else:
+            result.append(tiles[i])
+            i -= 1
+    result.reverse()
+    return result
+
+def _make_collapse(ignore_gaps: bool, operator_runs: str) -> callable:
+    squeeze = SQUEEZERS[operator_runs]
+
+    if ignore_gaps:
+        def collapse_tiles(line: tuple[int, ...], reduce: callable) -> list[int]:
+            return reduce(squeeze([cell for cell in line if cell != SPACE]))
+    else:
+        # Gaps split the line into segments that collapse on their own, then slide together
+        def collapse_tiles(line: tuple[int, ...], reduce: callable) -> list[int]:
+            tiles = [cell for cell in line if cell != SPACE]
+            if not tiles:
+                return tiles
+            # Usually the tiles are one segment (spaces only at the ends): nothing to split
+            first = line.index(tiles[0])
+            if SPACE not in line[first:first + len(tiles)]:
+                return reduce(squeeze(tiles))
+            tiles = []
+            for is_tile, segment in itertools.groupby(line, SPACE.__ne__):
+                if is_tile:
+                    tiles += reduce(squeeze(list(segment)))
+            return tiles
+
+    def collapse(line: tuple[int, ...], to_end: bool) -> tuple[int, ...]:
+        """Collapsed line padded back to len(line); to_end is False for left/up and True for right/down."""
+        tiles = tuple(collapse_tiles(line, _reduce_right if to_end else _reduce_left))
+        padding = (SPACE,) * (len(line) - len(tiles))
+        return padding + tiles if to_end else tiles + padding
+
+    return collapse
+
+def _make_line_moves(ignore_gaps: bool, operator_runs: str) -> callable:
+    merge_runs = operator_runs != "none"
+
+    def variant_line_moves(lst: list[int]) -> tuple[bool, bool]:
+        """game.line_moves for these rules: with gaps kept, only tiles in the same segment can combine."""
+        can_left = can_right = False
+        seen_space = seen_tile = False
+        prev = prev_prev = SPACE
+
+        for cell in lst:
+            if cell == SPACE:
+                seen_space = True
+                can_right = can_right or seen_tile
+                if not ignore_gaps:
+                    prev = prev_prev = SPACE
+            else:
+                can_left = can_left or seen_space
+                if cell in OPERATOR_SET:
+                    if merge_runs and cell == prev:
+                        return True, True
+                elif prev in OPERATOR_SET and prev_prev != SPACE and prev_prev not in OPERATOR_SET:
+                    return True, True
+                prev_prev, prev = prev, cell
+                seen_tile = True
+
+            if can_left and can_right:
+                return True, True
+
+        return can_left, can_right
+
+    return variant_line_moves
+
+@functools.lru_cache(maxsize=None)
+def line_engine(ignore_gaps: bool, operator_runs: str) -> tuple[callable, LineCache, callable]:
+    """
+    (collapse, line cache, line_moves) for one gap/run setting, shared by every RuleSet using it.
+    game.py's own rules keep LINE_CACHE and line_moves.
+    """
+    collapse = _make_collapse(ignore_gaps, operator_runs)
+    if ignore_gaps and operator_runs == "full":
+        return collapse, LINE_CACHE, line_moves
+    return collapse, LineCache(collapse=collapse), _make_line_moves(ignore_gaps, operator_runs)
+
+class CompiledRules(NamedTuple):
+    collapse: callable
+    line_cache: LineCache
+    line_moves: callable
+    operations: tuple[int, ...]
+    prob_operations: float
+    tiles_per_turn: int
+
+@dataclass(frozen=True)
+class RuleSet:
+    """
+    One rule variant. Pass it to Game (or SixSevenEnv, auto_play, bot_trials) as rules=.
+
+    Attributes:
+        ignore_gaps: Collapse num op num across empty cells instead of only between adjacent tiles
+        operator_runs: How runs of the same operator collapse: "none", "partial" or "full"
+        operations: Operators that spawn
+        prob_operations: Chance that a spawned tile is an operator
+        tiles_per_turn: Tiles spawned after every move
+    """
+    ignore_gaps: bool = True
+    operator_runs: str = "full"
+    operations: tuple[int, ...] = (ADDITION, SUBTRACTION, MULTIPLICATION)
+    prob_operations: float = 0.67
+    tiles_per_turn: int = 2
+
+    def __post_init__(self):
+        if self.operator_runs not in OPERATOR_RUNS:
+            raise ValueError(f"operator_runs must be one of {OPERATOR_RUNS}, got {self.operator_runs!r}")
+        if not self.operations or not set(self.operations) <= OPERATOR_SET:
+            raise ValueError(f"operations must be a non-empty subset of {OPERATORS}")
+        if not 0 <= self.prob_operations <= 1:
+            raise ValueError("prob_operations must be between 0 and 1")
+        if self.tiles_per_turn < 1:
+            raise ValueError("tiles_per_turn must be at least 1")
+
+    def compile(self) -> CompiledRules:
+        return compile_rules(self)
+
+@functools.lru_cache(maxsize=None)
+def compile_rules(rules: RuleSet) -> CompiledRules:
+    collapse, line_cache, moves = line_engine(rules.ignore_gaps, rules.operator_runs)
+    return CompiledRules(collapse, line_cache, moves, rules.operations, rules.prob_operations, rules.tiles_per_turn)
+
+# The versions in other_game_versions/ and game.py itself
+VARIANTS = {
+    "original": RuleSet(ignore_gaps=False, operator_runs="none", prob_operations=0.5),
+    "modified": RuleSet(ignore_gaps=True, operator_runs="none", prob_operations=0.5),
+    "modified_2": RuleSet(ignore_gaps=True, operator_runs="partial", operations=(ADDITION, SUBTRACTION)),
+    "final": RuleSet(),
+}
+
+LEGACY_CELLS = {"": SPACE, "+": ADDITION, "-": SUBTRACTION, "*": MULTIPLICATION}
+
+def from_legacy_line(lst: list) -> tuple[int, ...]:
+    """Legacy string cells ("", "+", "7", or ints produced by a collapse) as int cells."""
+    return tuple(LEGACY_CELLS[cell] if cell in LEGACY_CELLS else int(cell) for cell in lst)
+
+def legacy_collapse(variant: str, lst: list[str], to_end: bool) -> tuple[int, ...]:
+    """Collapses a string-cell line with the legacy module for variant, padded like its Game does."""
+    if variant == "original":
+        from other_game_versions import game as legacy
+        return from_legacy_line(legacy.collapse_list(lst, "right" if to_end else "left"))
+    padding = [""] * len(lst)
+    if variant == "modified":
+        from other_game_versions import game_modified as legacy
+    else:
+        from other_game_versions import game_modified_2 as legacy
+        lst = legacy.remove_extra_spaces(lst)
+    if to_end:
+        collapsed = legacy.collapse_list_right(lst)
+        return from_legacy_line(padding[len(collapsed):] + collapsed)
+    collapsed = legacy.collapse_list_left(lst)
+    return from_legacy_line(collapsed + padding[len(collapsed):])
+
+def differential_check(num_lines: int, seed: int = 0) -> None:
+    """
+    Collapses random lines with every variant's compiled routine and its legacy module (game.py's
+    collapse_line for "final"), checks line_moves against the collapses, and raises AssertionError
+    on the first difference.
+    """
+    from game import collapse_line
+    rng = random.Random(seed)
+    alphabet = ["", "", "+", "-", "*", "+", "-"] + [str(d) for d in range(10)] + [-3, 12, 67]
+
+    for _ in range(num_lines):
+        lst = [rng.choice(alphabet) for _ in range(rng.randint(1, 10))]
+        line = from_legacy_line(lst)
+        for variant, rules in VARIANTS.items():
+            compiled = rules.compile()
+            for to_end in (False, True):
+                expected = collapse_line(line, to_end) if variant == "final" else legacy_collapse(variant, lst, to_end)
+                actual = compiled.collapse(line, to_end)
+                assert actual == expected, f"{variant} {'right' if to_end else 'left'} of {lst}: {actual} != {expected}"
+                assert compiled.line_cache.collapse(line, to_end) == expected
+            assert compiled.line_moves(list(line)) == (compiled.collapse(line, False) != line,
+                                                        compiled.collapse(line, True) != line), (variant, lst)
+
+if __name__ == "__main__":
+    differential_check(20000)
+    print("Compiled variants match the legacy versions")
+
+    # Random play on each variant, against the legacy module's own auto_play where one exists
+    import importlib
+    legacy_modules = {"original": "game", "modified": "game_modified", "modified_2": "game_modified_2"}
+    num_games = 200
+    for variant, rules in VARIANTS.items():
+        random.seed(0)
+        start = time.time()
+        results = [auto_play(6, 7, rules=rules) for _ in range(num_games)]
+        elapsed = time.time() - start
+        line = (f"{variant:>10}: {sum(won for won, moves in results)} wins, "
+                f"{sum(moves for won, moves in results) / num_games:.1f} moves/game, "
+                f"{sum(moves for won, moves in results) / elapsed:.0f} moves/s")
+        if variant in legacy_modules:
+            legacy = importlib.import_module(f"other_game_versions.{legacy_modules[variant]}")
+            random.seed(0)
+            start = time.time()
+            legacy_moves = sum(legacy.auto_play(6, 7)[1] for _ in range(num_games))
+            line += f" (legacy: {legacy_moves / (time.time() - start):.0f} moves/s)"
+        print(line)
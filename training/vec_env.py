@@ -0,0 +1,256 @@
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+
+from fast_game import CELL_DTYPE, MOVES, collapse_lines, valid_move_mask
+from game import ADDITION, MULTIPLICATION, SPACE, SUBTRACTION, Game
+from sixseven_env import LOWER_BOUND, NUM_CHANNELS, UPPER_BOUND
+
+# info["valid_moves"] for every 4-bit valid-move mask
+VALID_MOVE_LISTS = [[move for bit, move in enumerate(MOVES) if mask >> bit & 1] for mask in range(16)]
+MASK_BITS = 1 << np.arange(4)
+
+def encode_boards(boards: np.ndarray, channels_first: bool = False) -> np.ndarray:
+    """
+    Batched SixSevenEnv._get_observation: (N, rows, cols) boards -> (N, rows * cols * 5) float32,
+    or (N, 5, rows, cols) if channels_first.
+    """
+    is_space = boards == SPACE
+    is_add = boards == ADDITION
+    is_sub = boards == SUBTRACTION
+    is_mul = boards == MULTIPLICATION
+    values = np.where(is_space | is_add | is_sub | is_mul, 0, boards / 1000)
+    if channels_first:
+        return np.stack([values, is_space, is_add, is_sub, is_mul], axis=1).astype(np.float32)
+    encoded = np.stack([values, is_space, is_add, is_sub, is_mul], axis=-1).astype(np.float32)
+    return encoded.reshape(len(boards), -1)
+
+class SixSevenVecEnv(VecEnv):
+    """
+    N SixSevenEnv games stepped together on one (N, rows, cols) board array.
+
+    Slides, tile spawning, win/loss checks, reward shaping and observation encoding are
+    batched array operations, and finished boards are reset automatically (the final
+    observation is kept in info["terminal_observation"] like SB3's DummyVecEnv).
+    Rewards and terminations follow SixSevenEnv.step; tiles are spawned from this env's
+    own NumPy generator instead of the global random module.
+    """
+
+    def __init__(self, num_envs: int, num_rows: int = 6, num_cols: int = 7, max_steps: int = 1000,
+                 channels_first: bool = False):
+        """
+        Initialize the environments.
+
+        Args:
+            num_envs: Number of boards stepped together
+            num_rows: Number of rows in each game grid
+            num_cols: Number of columns in each game grid
+            max_steps: Maximum steps per episode before truncation
+            channels_first: Observe (5, rows, cols) arrays for CNN policies instead of flat vectors
+        """
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.max_steps = max_steps
+        self.render_mode = None
+        self.channels_first = channels_first
+
+        # Spawn settings come from Game so both environments stay in sync
+        template = Game(num_rows, num_cols)
+        self.prob_operations = template._prob_operations
+        self.num_generated_tiles = template._num_generated_tiles
+        self.generated_operations = np.array(template._generated_operations, dtype=CELL_DTYPE)
+        self.generated_digits = np.array(template._generated_digits, dtype=CELL_DTYPE)
+
+        if channels_first:
+            observation_shape = (NUM_CHANNELS, num_rows, num_cols)
+        else:
+            observation_shape = (num_rows * num_cols * NUM_CHANNELS,)
+        observation_space = spaces.Box(low=LOWER_BOUND, high=UPPER_BOUND, shape=observation_shape, dtype=np.float32)
+        super().__init__(num_envs, observation_space, spaces.Discrete(4))
+
+        self.action_map = dict(enumerate(MOVES))
+        self.np_random = np.random.default_rng()
+        self._boards = np.full((num_envs, num_rows, num_cols), SPACE, dtype=CELL_DTYPE)
+        self._steps = np.zeros(num_envs, dtype=np.int64)
+        self._min_dist = np.full(num_envs, 1000.0)
+        # (N, 4) valid moves of the current boards in MOVES order, reused by the next step
+        self._valid = np.zeros((num_envs, 4), dtype=bool)
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+
+    def _slide(self, indices: np.ndarray) -> None:
+        """Slides the selected boards in their action's direction: one kernel call per axis."""
+        actions = self._actions[indices]
+        horizontal = actions >= 2
+
+        rows = indices[horizontal]
+        if len(rows):
+            reverse = (actions[horizontal] == 3)[:, None, None]
+            self._boards[rows] = collapse_lines(self._boards[rows], reverse=reverse)
+
+        cols = indices[~horizontal]
+        if len(cols):
+            reverse = (actions[~horizontal] == 1)[:, None, None]
+            columns = np.swapaxes(self._boards[cols], 1, 2)
+            self._boards[cols] = np.swapaxes(collapse_lines(columns, reverse=reverse), 1, 2)
+
+    def _spawn(self, indices: np.ndarray) -> None:
+        """Generates up to num_generated_tiles tiles on distinct blank cells of each selected board."""
+        if len(indices) == 0:
+            return
+
+        flat = self._boards.reshape(self.num_envs, -1)[indices]
+        blank = flat == SPACE
+        shape = (len(indices), min(self.num_generated_tiles, flat.shape[1]))
+
+        # Random keys on blank cells, sorted, give a uniform sample without replacement
+        keys = np.where(blank, self.np_random.random(blank.shape), 2.0)
+        positions = np.argsort(keys, axis=1)[:, :shape[1]]
+        is_operation = self.np_random.random(shape) <= self.prob_operations
+        tiles = np.where(
+            is_operation,
+            self.generated_operations[self.np_random.integers(len(self.generated_operations), size=shape)],
+            self.generated_digits[self.np_random.integers(len(self.generated_digits), size=shape)],
+        )
+
+        # Boards with fewer blanks than tiles keep their occupied cells
+        current = np.take_along_axis(flat, positions, axis=1)
+        np.put_along_axis(flat, positions, np.where(np.take_along_axis(blank, positions, axis=1), tiles, current), axis=1)
+        self._boards.reshape(self.num_envs, -1)[indices] = flat
+
+    def _min_distance(self, boards: np.ndarray) -> np.ndarray:
+        """Batched SixSevenEnv._calculate_min_distance."""
+        is_number = boards <= 1000
+        distance = np.where(is_number, np.abs(boards - 67), np.iinfo(CELL_DTYPE).max).min(axis=(1, 2))
+        return np.where(is_number.any(axis=(1, 2)), distance, 1000).astype(np.float64)
+
+    def _reset_boards(self, indices: np.ndarray) -> None:
+        self._boards[indices] = SPACE
+        self._steps[indices] = 0
+        self._spawn(indices)
+        self._min_dist[indices] = self._min_distance(self._boards[indices])
+        self._valid[indices] = valid_move_mask(self._boards[indices])
+
+    def _infos(self, indices, won: np.ndarray) -> list[dict]:
+        masks = (self._valid[indices] @ MASK_BITS).tolist()
+        steps = self._steps[indices].tolist()
+        return [{"valid_moves": list(VALID_MOVE_LISTS[mask]), "steps": step, "win": int(win)}
+                for mask, step, win in zip(masks, steps, won.tolist())]
+
+    def reset(self) -> np.ndarray:
+        seed = next((seed for seed in self._seeds if seed is not None), None)
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
+        self._reset_seeds()
+        self._reset_options()
+
+        self._reset_boards(np.arange(self.num_envs))
+        self.reset_infos = self._infos(slice(None), np.zeros(self.num_envs, dtype=bool))
+        return encode_boards(self._boards, self.channels_first)
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        env_indices = np.arange(self.num_envs)
+        self._steps += 1
+
+        # 1. Slide every board whose action is valid; invalid moves cost -5
+        prev_valid = self._valid.any(axis=1)
+        moved = self._valid[env_indices, self._actions]
+        rewards = np.where(moved, 0.0, -5.0)
+        moved_indices = np.flatnonzero(moved)
+        self._slide(moved_indices)
+        self._spawn(moved_indices)
+
+        # 2. Shaping and living rewards for boards that moved
+        curr_dist = self._min_distance(self._boards)
+        empty_spaces = (self._boards == SPACE).sum(axis=(1, 2))
+        rewards += np.where(moved, (self._min_dist - curr_dist) * 0.1 + empty_spaces * 0.01, 0.0)
+        self._min_dist = np.where(moved, curr_dist, self._min_dist)
+
+        # 3. Terminal states; like SixSevenEnv, a loss uses the pre-move valid moves
+        won = (self._boards == 67).any(axis=(1, 2))
+        is_number = (self._boards != SPACE) & (self._boards != ADDITION) & (self._boards != SUBTRACTION) & (self._boards != MULTIPLICATION)
+        out_of_bounds = (is_number & ((self._boards < -1000) | (self._boards > 1000))).any(axis=(1, 2))
+        lost = ~won & (~prev_valid | out_of_bounds)
+        rewards += np.where(won, 100.0, np.where(lost, -50.0, 0.0))
+        terminated = won | lost
+        truncated = ~terminated & (self._steps >= self.max_steps)
+        dones = terminated | truncated
+
+        self._valid = valid_move_mask(self._boards)
+        observations = encode_boards(self._boards, self.channels_first)
+        infos = self._infos(slice(None), won)
+
+        # 4. Auto-reset finished boards
+        done_indices = np.flatnonzero(dones)
+        if len(done_indices):
+            for i in done_indices:
+                infos[i]["terminal_observation"] = observations[i].copy()
+                infos[i]["TimeLimit.truncated"] = bool(truncated[i])
+            self._reset_boards(done_indices)
+            observations[done_indices] = encode_boards(self._boards[done_indices], self.channels_first)
+            for i, info in zip(done_indices, self._infos(done_indices, np.zeros(len(done_indices), dtype=bool))):
+                self.reset_infos[i] = info
+
+        return observations, rewards.astype(np.float32), dones, infos
+
+    def close(self) -> None:
+        pass
+
+    def _indices(self, indices) -> list[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    # The boards share this object, so attributes are shared too
+    def get_attr(self, attr_name: str, indices=None) -> list:
+        return [getattr(self, attr_name) for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value, indices=None) -> None:
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list:
+        """Calls a batched method on this env; it must return one entry per board."""
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result[i] for i in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list[bool]:
+        return [False for _ in self._indices(indices)]
+
+    def action_masks(self) -> np.ndarray:
+        """
+        Batched SixSevenEnv.action_masks: (N, 4) legal actions of the current boards, from the
+        valid-move masks the next step checks actions against. Called by MaskablePPO through env_method.
+        """
+        masks = self._valid.copy()
+        masks[~masks.any(axis=1)] = True
+        return masks
+
+    def get_boards(self) -> np.ndarray:
+        """Current (N, rows, cols) boards; read-only view."""
+        boards = self._boards.view()
+        boards.flags.writeable = False
+        return boards
+
+
+if __name__ == "__main__":
+    import time
+    from stable_baselines3.common.vec_env import DummyVecEnv
+    from sixseven_env import SixSevenEnv
+
+    num_envs = 256
+    num_steps = 100
+    rng = np.random.default_rng(0)
+
+    for name, env in (("DummyVecEnv", DummyVecEnv([SixSevenEnv for _ in range(num_envs)])),
+                      ("SixSevenVecEnv", SixSevenVecEnv(num_envs))):
+        env.seed(0)
+        env.reset()
+        start = time.time()
+        for i in range(num_steps):
+            env.step(rng.integers(4, size=num_envs))
+        elapsed = time.time() - start
+        print(f"{name}: {num_envs * num_steps / elapsed:.0f} steps/second")